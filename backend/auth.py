@@ -1,5 +1,8 @@
+import hashlib
+import hmac
 import os
 import secrets
+import time
 from datetime           import datetime, timedelta, timezone
 from typing             import Optional
 
@@ -7,18 +10,23 @@ from fastapi            import Depends, HTTPException, status, Request
 from fastapi.security   import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
 from jose               import JWTError, jwt
 from pydantic           import BaseModel
-from sqlalchemy.orm     import Session
 
-from database           import get_db
-from config             import DATABASE_TYPE
-
-if DATABASE_TYPE == "mongo":
-    from database_mongo import get_database
-    from models_mongo import APIClientCollection
+from password_hasher    import password_hasher
+from jwt_keys           import KeyRing
+from revocation         import revocation_list
+from cache              import TTLCache
+from repositories       import api_client_repository
+from metrics            import PHASE_DURATION
 
 JWT_SECRET_KEY                      = os.getenv("JWT_SECRET_KEY", "your-super-secret-jwt-key-change-in-production")
 JWT_ALGORITHM                       = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_ACCESS_TOKEN_EXPIRE_MINUTES     = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+API_CLIENT_CACHE_SIZE               = int(os.getenv("API_CLIENT_CACHE_SIZE", "1024"))
+API_CLIENT_CACHE_TTL                = int(os.getenv("API_CLIENT_CACHE_TTL", "60"))
+JWT_CACHE_SIZE                      = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+JWKS_MAX_AGE                        = int(os.getenv("JWKS_MAX_AGE", "300"))
+
+key_ring                            = KeyRing.load(JWT_ALGORITHM, JWT_SECRET_KEY)
 
 
 class TokenData(BaseModel):
@@ -26,6 +34,9 @@ class TokenData(BaseModel):
     username        : str
     role            : str
     token_type      : str = "user"
+    jti             : Optional[str] = None
+    exp             : Optional[int] = None
+    iat             : Optional[float] = None
 
 
 class Token(BaseModel):
@@ -41,6 +52,16 @@ class APIClientData(BaseModel):
 
 
 
+# Successfully verified (client_id, keyed secret digest) -> APIClientData.
+# Each worker process has its own cache; get_api_client checks the shared
+# revocation list first, so a client revoked on another worker is rejected.
+api_client_cache    = TTLCache(maxsize=API_CLIENT_CACHE_SIZE, ttl=API_CLIENT_CACHE_TTL)
+_secret_digest_key  = secrets.token_bytes(32)
+
+# sha256(token) -> (validated claims, TokenData). Entries expire at the
+# token's own `exp`, so a cached token is never accepted after it expires.
+token_cache         = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 bearer_scheme       = HTTPBearer(auto_error=False)
 api_key_header      = APIKeyHeader(name="X-API-Key", auto_error=False)
 api_secret_header   = APIKeyHeader(name="X-API-Secret", auto_error=False)
@@ -48,20 +69,32 @@ api_secret_header   = APIKeyHeader(name="X-API-Secret", auto_error=False)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
+    started = time.perf_counter()
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc)})
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    to_encode.update({
+        "exp": expire,
+        # fractional, so revoking a user's tokens (revocation.py) is ordered
+        # correctly against a token issued within the same second
+        "iat": time.time(),
+        "jti": secrets.token_urlsafe(16),
+    })
+    encoded_jwt = jwt.encode(
+        to_encode, key_ring.signing_key, algorithm=JWT_ALGORITHM, headers=key_ring.headers
+    )
+    PHASE_DURATION.observe(time.perf_counter() - started, "jwt_encode")
     return encoded_jwt
 
 
 def decode_token(token: str) -> dict:
     """Decode and validate a JWT token."""
+    started = time.perf_counter()
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        key = key_ring.verification_key(jwt.get_unverified_header(token).get("kid"))
+        payload = jwt.decode(token, key, algorithms=[JWT_ALGORITHM])
         return payload
     except JWTError:
         raise HTTPException(
@@ -69,6 +102,8 @@ def decode_token(token: str) -> dict:
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    finally:
+        PHASE_DURATION.observe(time.perf_counter() - started, "jwt_decode")
 
 
 def generate_client_credentials() -> tuple[str, str]:
@@ -78,16 +113,28 @@ def generate_client_credentials() -> tuple[str, str]:
     return client_id, client_secret
 
 
-def hash_client_secret(secret: str) -> str:
+async def hash_client_secret(secret: str) -> str:
     """Hash a client secret for storage."""
-    import bcrypt
-    return bcrypt.hashpw(secret.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    return await password_hasher.hash(secret)
 
 
-def verify_client_secret(plain_secret: str, hashed_secret: str) -> bool:
+async def verify_client_secret(plain_secret: str, hashed_secret: str) -> bool:
     """Verify a client secret against its hash."""
-    import bcrypt
-    return bcrypt.checkpw(plain_secret.encode("utf-8"), hashed_secret.encode("utf-8"))
+    return await password_hasher.verify(plain_secret, hashed_secret)
+
+
+def _client_secret_digest(secret: str) -> bytes:
+    """Keyed digest of a client secret, so plaintext secrets are never cached."""
+    return hmac.new(_secret_digest_key, secret.encode("utf-8"), hashlib.sha256).digest()
+
+
+def evict_api_client(client_id: str):
+    """
+    Drop every cached verification for a client and mark it revoked.
+    Raises StorageFull if the revocation list has no room for it.
+    """
+    api_client_cache.evict(lambda key: key[0] == client_id)
+    revocation_list.revoke_client(client_id)
 
 
 async def get_current_user(
@@ -101,27 +148,57 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    payload = decode_token(credentials.credentials)
+    token = credentials.credentials
+    cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = token_cache.get(cache_key)
+    if cached is not None and cached[0]["exp"] > time.time():
+        token_data = cached[1]
+    else:
+        payload = decode_token(token)
+
+        if payload.get("token_type") != "user":
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token type for this endpoint",
+            )
+
+        token_data = TokenData(
+            user_id=payload.get("user_id"),
+            username=payload.get("username"),
+            role=payload.get("role", "guest"),
+            token_type="user",
+            jti=payload.get("jti"),
+            exp=payload.get("exp"),
+            iat=payload.get("iat"),
+        )
+        token_cache.set(cache_key, (payload, token_data), ttl=payload.get("exp", 0) - time.time())
 
-    if payload.get("token_type") != "user":
+    if revocation_list.is_user_token_revoked(token_data.user_id, token_data.iat):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token type for this endpoint",
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return TokenData(
-        user_id=payload.get("user_id"),
-        username=payload.get("username"),
-        role=payload.get("role", "guest"),
-        token_type="user",
-    )
+    return token_data
+
+
+async def require_admin(
+    current_user: TokenData = Depends(get_current_user),
+) -> TokenData:
+    """Dependency that only lets users with the 'admin' role through."""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin role required",
+        )
+    return current_user
 
 
 async def get_api_client(
     request: Request,
     api_key: Optional[str] = Depends(api_key_header),
     api_secret: Optional[str] = Depends(api_secret_header),
-    db: Session = Depends(get_db),
 ) -> APIClientData:
     """Dependency to authenticate external API clients via client_id and client_secret."""
     if not api_key or not api_secret:
@@ -130,51 +207,39 @@ async def get_api_client(
             detail="API credentials required (X-API-Key and X-API-Secret headers)",
         )
 
-    if DATABASE_TYPE == "mongo":
-        mongo_db = get_database()
-        client = await APIClientCollection.find_by_client_id(mongo_db, api_key)
-    else:
-        from models import APIClient
-        client = db.query(APIClient).filter(
-            APIClient.client_id == api_key,
-            APIClient.is_active == True
-        ).first()
-
-    if not client:
+    if revocation_list.is_client_revoked(api_key):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API credentials",
         )
 
+    cache_key = (api_key, _client_secret_digest(api_secret))
+    cached = api_client_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-    if DATABASE_TYPE == "mongo":
-        hashed_secret = client.get("hashed_secret")
-        client_name = client.get("name")
-        client_id = client.get("client_id")
-        is_active = client.get("is_active", True)
-    else:
-        hashed_secret = client.hashed_secret
-        client_name = client.name
-        client_id = client.client_id
-        is_active = client.is_active
+    # Only active clients are returned; a deactivated one is not found
+    client = await api_client_repository.find_active_by_client_id(api_key)
 
-    if not is_active:
+    if not client:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="API client is disabled",
+            detail="Invalid API credentials",
         )
 
-    if not verify_client_secret(api_secret, hashed_secret):
+    if not await verify_client_secret(api_secret, client.hashed_secret):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API credentials",
         )
 
-    return APIClientData(
-        client_id=client_id,
-        client_name=client_name,
+    client_data = APIClientData(
+        client_id=client.client_id,
+        client_name=client.name,
         token_type="api_client",
     )
+    api_client_cache.set(cache_key, client_data)
+    return client_data
 
 
 async def get_current_user_or_api_client(
@@ -182,7 +247,6 @@ async def get_current_user_or_api_client(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
     api_key: Optional[str] = Depends(api_key_header),
     api_secret: Optional[str] = Depends(api_secret_header),
-    db: Session = Depends(get_db),
 ) -> TokenData | APIClientData:
     """
     Dependency that accepts either JWT token (for logged-in users)
@@ -196,9 +260,10 @@ async def get_current_user_or_api_client(
 
     if api_key and api_secret:
         try:
-            return await get_api_client(request, api_key, api_secret, db)
-        except HTTPException:
-            pass
+            return await get_api_client(request, api_key, api_secret)
+        except HTTPException as exc:
+            if exc.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+                raise
 
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
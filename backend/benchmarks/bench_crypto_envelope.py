@@ -0,0 +1,54 @@
+"""
+Microbenchmark: `crypto_utils.decrypt_payload` for v1 and v2 envelopes.
+
+v1 is the CryptoJS "Salted__" format (per-request EVP_BytesToKey + AES-CBC),
+v2 is AES-256-GCM under a key derived once at import. Both decrypt the same
+login-sized JSON payload.
+
+    cd backend && python -m benchmarks.bench_crypto_envelope [--iterations 20000]
+"""
+import argparse
+import base64
+import json
+import os
+import time
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+import crypto_utils
+
+PAYLOAD = {"username": "benchmark-user", "email": "bench@example.com", "password": "correct horse battery"}
+
+
+def encrypt_v1(data: dict) -> str:
+    """Same output as CryptoJS.AES.encrypt(json, ENCRYPTION_KEY).toString()."""
+    salt = os.urandom(8)
+    key, iv = crypto_utils._evp_bytes_to_key(crypto_utils.ENCRYPTION_KEY.encode(), salt, 32, 16)
+    ciphertext = AES.new(key, AES.MODE_CBC, iv).encrypt(pad(json.dumps(data).encode("utf-8"), AES.block_size))
+    return base64.b64encode(b"Salted__" + salt + ciphertext).decode("ascii")
+
+
+def _time_per_call(envelope: str, iterations: int) -> float:
+    decrypt = crypto_utils.decrypt_payload
+    started = time.perf_counter()
+    for _ in range(iterations):
+        decrypt(envelope)
+    return (time.perf_counter() - started) / iterations
+
+
+def main(iterations: int):
+    v1 = encrypt_v1(PAYLOAD)
+    v2 = crypto_utils.encrypt_payload_v2(PAYLOAD)
+    assert crypto_utils.decrypt_payload(v1) == crypto_utils.decrypt_payload(v2) == PAYLOAD
+
+    for name, envelope in (("v1 (CryptoJS, CBC)", v1), ("v2 (AES-256-GCM)", v2)):
+        per_call = _time_per_call(envelope, iterations)
+        print(f"{name:<20}{per_call * 1e6:>8.2f} us/decrypt  {1 / per_call:>10.0f} ops/s  ({len(envelope)} bytes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.iterations)
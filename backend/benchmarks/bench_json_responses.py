@@ -0,0 +1,112 @@
+"""
+Benchmark: default vs fast JSON responses (FAST_JSON_RESPONSES) for list responses.
+
+Serves an APIClientListResponse of 10, 1k and 10k API client records from
+the same route definition /api-clients uses (response_model declared, dicts
+built from repository records, returned through `fast_json.trusted`), once
+in each mode, by calling the ASGI app directly. Both modes must produce the
+same bytes; the benchmark checks that before timing.
+
+    cd backend && python -m benchmarks.bench_json_responses [--sizes 10 1000 10000] [--seconds 2]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI
+
+import fast_json
+from repositories import APIClientRecord
+from schemas import APIClientListResponse
+
+
+def _records(count: int) -> list[APIClientRecord]:
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        APIClientRecord(
+            id              =str(i),
+            name            =f"client {i}",
+            client_id       =f"cli_{i:032x}",
+            hashed_secret   ="x",
+            created_by      ="1",
+            is_active       =i % 7 != 0,
+            created_at      =started + timedelta(seconds=i, microseconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+def _app(records: list[APIClientRecord]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api-clients", response_model=APIClientListResponse)
+    async def list_api_clients():
+        return fast_json.trusted(APIClientListResponse, {
+            "clients"       : [
+                {
+                    "id"        : c.id,
+                    "name"      : c.name,
+                    "client_id" : c.client_id,
+                    "is_active" : c.is_active,
+                    "created_at": c.created_at,
+                }
+                for c in records
+            ],
+            "next_cursor"   : None,
+        })
+
+    return app
+
+
+async def _request(app) -> bytes:
+    scope = {
+        "type": "http", "method": "GET", "path": "/api-clients", "raw_path": b"/api-clients",
+        "query_string": b"", "headers": [], "root_path": "", "scheme": "http",
+        "server": ("bench", 80), "http_version": "1.1",
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def _time(app, fast: bool, seconds: float) -> tuple[float, bytes]:
+    """Best per-request time over `seconds` of back-to-back requests."""
+    fast_json.FAST_JSON_RESPONSES = fast
+    body = await _request(app)
+    best = float("inf")
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await _request(app)
+        best = min(best, time.perf_counter() - started)
+    return best, body
+
+
+async def main(args):
+    print(f"{'items':>8}{'default ms':>12}{'fast ms':>10}{'speedup':>9}{'body KiB':>10}")
+    for size in args.sizes:
+        app = _app(_records(size))
+        default, default_body = await _time(app, False, args.seconds)
+        fast, fast_body = await _time(app, True, args.seconds)
+        if default_body != fast_body:
+            raise SystemExit(f"{size} items: fast mode produced a different body")
+        print(
+            f"{size:>8}{default * 1e3:>12.3f}{fast * 1e3:>10.3f}"
+            f"{default / fast:>8.1f}x{len(fast_body) / 1024:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,47 @@
+"""
+Microbenchmark: bearer authentication with and without the decoded-JWT cache.
+
+Measures `auth.get_current_user` on the same token, once with a cold cache
+on every call (full python-jose decode + TokenData) and once warm.
+
+    cd backend && python -m benchmarks.bench_jwt_cache [--iterations 20000]
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+
+
+async def _time_per_call(iterations: int, clear_cache: bool) -> float:
+    token = auth.create_access_token(
+        data={"user_id": "1", "username": "bench", "role": "guest", "token_type": "user"},
+        expires_delta=timedelta(minutes=30),
+    )
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    auth.token_cache.clear()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        if clear_cache:
+            auth.token_cache.clear()
+        await auth.get_current_user(credentials)
+    return (time.perf_counter() - started) / iterations
+
+
+async def main(iterations: int):
+    uncached = await _time_per_call(iterations, clear_cache=True)
+    cached = await _time_per_call(iterations, clear_cache=False)
+    print(f"decode every request  {uncached * 1e6:>8.2f} us/request")
+    print(f"token cache hit       {cached * 1e6:>8.2f} us/request")
+    print(f"saving                {(uncached - cached) * 1e6:>8.2f} us/request ({uncached / cached:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
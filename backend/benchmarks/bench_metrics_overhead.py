@@ -0,0 +1,72 @@
+"""
+Microbenchmark: cost of the metrics subsystem when enabled.
+
+Times a single Histogram.observe / Counter.inc, the MetricsMiddleware wrapped
+around a no-op ASGI app (the fixed per-request cost), and rendering /metrics
+once a realistic number of series exists.
+
+    cd backend && python -m benchmarks.bench_metrics_overhead [--iterations 200000]
+"""
+import argparse
+import asyncio
+import time
+
+import metrics
+
+
+def _per_call(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+async def _asgi_per_request(app, iterations: int) -> float:
+    class Route:
+        path = "/health"
+
+    scope = {"type": "http", "method": "GET", "route": Route()}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / iterations
+
+
+async def _noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def main(iterations: int):
+    histogram = metrics.PHASE_DURATION
+    counter = metrics.RATE_LIMITED
+
+    observe = _per_call(lambda: histogram.observe(0.0003, "bench"), iterations)
+    inc = _per_call(lambda: counter.inc("bench"), iterations)
+    bare = await _asgi_per_request(_noop_app, iterations)
+    wrapped = await _asgi_per_request(metrics.MetricsMiddleware(_noop_app), iterations)
+
+    for route in range(20):
+        for status_code in ("200", "401", "429"):
+            metrics.REQUEST_DURATION.observe(0.001, "GET", f"/route/{route}", status_code)
+    render = _per_call(metrics.render, 200)
+
+    print(f"Histogram.observe            {observe * 1e6:>8.3f} us")
+    print(f"Counter.inc                  {inc * 1e6:>8.3f} us")
+    print(f"ASGI request, no middleware  {bare * 1e6:>8.3f} us")
+    print(f"ASGI request, with metrics   {wrapped * 1e6:>8.3f} us  (+{(wrapped - bare) * 1e6:.3f} us/request)")
+    print(f"render /metrics ({len(metrics.render().splitlines())} lines)  {render * 1e3:>6.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,84 @@
+"""
+Benchmark: per-hit cost of the rate limit storages, plus a cross-process check.
+
+Compares limits' in-process "memory://" storage with the shared-memory
+"shm://" storage under the fixed-window strategy slowapi uses, and the GCRA
+limiter (one timestamp per key) on both, then has several processes hit one
+key concurrently to show the shm counter is shared.
+
+    cd backend && python -m benchmarks.bench_rate_limit_storage [--keys 10000] [--hits 200000] [--processes 4]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import shm_storage  # noqa: F401
+from rate_limiter import GCRA
+
+
+def _time_per_hit(uri: str, keys: int, hits: int) -> float:
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    item = parse("1000000/minute")
+    identifiers = [f"api:cli_{i}" for i in range(keys)]
+
+    started = time.perf_counter()
+    for i in range(hits):
+        limiter.hit(item, identifiers[i % keys])
+    return (time.perf_counter() - started) / hits
+
+
+def _time_per_gcra_hit(uri: str, keys: int, hits: int) -> float:
+    limiter = GCRA(uri)
+    item = parse("1000000/minute")
+    identifiers = [f"api:cli_{i}" for i in range(keys)]
+
+    started = time.perf_counter()
+    for i in range(hits):
+        limiter.hit(identifiers[i % keys], item)
+    return (time.perf_counter() - started) / hits
+
+
+def _hammer(uri: str, hits: int):
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    item = parse("1000000/minute")
+    for _ in range(hits):
+        limiter.hit(item, "shared-key")
+
+
+def main(keys: int, hits: int, processes: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        shm_uri = f"shm://{os.path.join(tmp, 'bench.shm')}?slots=131072"
+
+        for name, uri in (("memory://", "memory://"), ("shm://", shm_uri)):
+            print(f"fixed-window {name:<10} {_time_per_hit(uri, keys, hits) * 1e6:>8.2f} us/hit")
+        for name, uri in (("memory://", "memory://"), ("shm://", shm_uri)):
+            print(f"GCRA         {name:<10} {_time_per_gcra_hit(uri, keys, hits) * 1e6:>8.2f} us/hit")
+
+        per_process = 2000
+        workers = [
+            multiprocessing.Process(target=_hammer, args=(shm_uri, per_process))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        storage = storage_from_string(shm_uri)
+        count = storage.get(parse("1000000/minute").key_for("shared-key"))
+        print(f"{processes} processes x {per_process} hits on one key -> shared count {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--hits", type=int, default=200000)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+    main(args.keys, args.hits, args.processes)
@@ -0,0 +1,91 @@
+"""
+Concurrency benchmark: blocking SQLAlchemy Session vs AsyncSession (aiosqlite).
+
+Runs the username lookup used by /auth/login from many concurrent coroutines
+and reports throughput plus the worst event-loop stall seen by a ticker task.
+
+    cd backend && python -m benchmarks.bench_sqlite_async [--users 1000] [--concurrency 50] [--requests 5000]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import User
+
+
+async def _loop_lag_monitor(stop: asyncio.Event, interval: float = 0.001) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def _run(lookup, usernames: list[str], concurrency: int, requests: int) -> dict:
+    queue = iter(range(requests))
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_loop_lag_monitor(stop))
+
+    async def worker():
+        for i in queue:
+            await lookup(usernames[i % len(usernames)])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return {"req_per_s": requests / elapsed, "max_loop_stall_ms": await monitor * 1000}
+
+
+async def main(users: int, concurrency: int, requests: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        sync_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=sync_engine)
+        SessionLocal = sessionmaker(bind=sync_engine, autoflush=False)
+
+        usernames = [f"user{i}" for i in range(users)]
+        with SessionLocal() as db:
+            db.add_all(
+                User(username=name, email=f"{name}@example.com", role=f"role{i}", hashed_password="x")
+                for i, name in enumerate(usernames)
+            )
+            db.commit()
+
+        async def sync_lookup(username: str):
+            with SessionLocal() as db:
+                db.scalar(select(User).where(User.username == username))
+
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+        async def async_lookup(username: str):
+            async with AsyncSessionLocal() as db:
+                await db.scalar(select(User).where(User.username == username))
+
+        for name, lookup in (("sync Session", sync_lookup), ("AsyncSession", async_lookup)):
+            result = await _run(lookup, usernames, concurrency, requests)
+            print(
+                f"{name:<14} {result['req_per_s']:>10.0f} req/s   "
+                f"max loop stall {result['max_loop_stall_ms']:>8.2f} ms"
+            )
+
+        await async_engine.dispose()
+        sync_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.concurrency, args.requests))
@@ -0,0 +1,138 @@
+"""
+Concurrency benchmark: SQLite read/write mix under the connection profiles.
+
+Writer coroutines insert users one transaction at a time (as /auth/register
+does) while reader coroutines look users up by username (as /auth/login
+does), for a fixed duration. Compared configurations:
+
+- default     rollback journal, SQLite's default synchronous, one shared pool
+- wal         the production pragmas, one shared pool
+- production  the production pragmas, a single writer connection plus a
+              separate read-only pool for lookups
+
+    cd backend && python -m benchmarks.bench_sqlite_concurrency [--readers 32] [--writers 8] [--seconds 5]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database import Base, create_sqlite_async_engine, sqlite_pragmas, _PROFILES
+from models import User
+
+PRODUCTION = _PROFILES["production"]
+PRODUCTION_PRAGMAS = sqlite_pragmas(
+    PRODUCTION["journal_mode"], PRODUCTION["synchronous"], PRODUCTION["mmap_size"],
+    PRODUCTION["cache_size"], PRODUCTION["busy_timeout"],
+)
+DEFAULT_PRAGMAS = sqlite_pragmas("", "", "", "", _PROFILES["default"]["busy_timeout"])
+
+
+def _percentile(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+
+async def _run(path: str, pragmas: dict, pool_size: int, max_overflow: int, read_pool_size: int, args) -> dict:
+    url = f"sqlite+aiosqlite:///{path}"
+    write_engine = create_sqlite_async_engine(url, pragmas, pool_size=pool_size, max_overflow=max_overflow)
+    read_engine = write_engine
+    if read_pool_size:
+        read_engine = create_sqlite_async_engine(
+            url, {**pragmas, "query_only": "ON"}, pool_size=read_pool_size, max_overflow=0
+        )
+    WriteSession = async_sessionmaker(write_engine, expire_on_commit=False)
+    ReadSession = async_sessionmaker(read_engine, expire_on_commit=False)
+
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with WriteSession() as db:
+        db.add_all(
+            User(username=f"user{i}", email=f"user{i}@example.com", role=f"seed{i}", hashed_password="x")
+            for i in range(args.users)
+        )
+        await db.commit()
+
+    read_latency, write_latency = [], []
+    errors = 0
+    ids = itertools.count()
+    deadline = time.perf_counter() + args.seconds
+
+    async def reader():
+        nonlocal errors
+        for i in itertools.count():
+            if time.perf_counter() >= deadline:
+                return
+            started = time.perf_counter()
+            try:
+                async with ReadSession() as db:
+                    await db.scalar(select(User).where(User.username == f"user{i % args.users}"))
+                read_latency.append(time.perf_counter() - started)
+            except OperationalError:
+                errors += 1
+
+    async def writer():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            n = next(ids)
+            started = time.perf_counter()
+            try:
+                async with WriteSession() as db:
+                    db.add(User(username=f"new{n}", email=f"new{n}@example.com", role=f"new{n}", hashed_password="x"))
+                    await db.commit()
+                write_latency.append(time.perf_counter() - started)
+            except OperationalError:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(reader() for _ in range(args.readers)), *(writer() for _ in range(args.writers)))
+    elapsed = time.perf_counter() - started
+
+    await write_engine.dispose()
+    if read_engine is not write_engine:
+        await read_engine.dispose()
+
+    return {
+        "reads_per_s"   : len(read_latency) / elapsed,
+        "writes_per_s"  : len(write_latency) / elapsed,
+        "read_p99_ms"   : _percentile(read_latency, 99) * 1000,
+        "write_p99_ms"  : _percentile(write_latency, 99) * 1000,
+        "errors"        : errors,
+    }
+
+
+async def main(args):
+    configs = (
+        ("default",     DEFAULT_PRAGMAS,    5, 10, 0),
+        ("wal",         PRODUCTION_PRAGMAS, 5, 10, 0),
+        ("production",  PRODUCTION_PRAGMAS, int(PRODUCTION["pool_size"]), int(PRODUCTION["max_overflow"]),
+                        int(PRODUCTION["read_pool_size"])),
+    )
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds}s each")
+    print(f"{'profile':<12}{'reads/s':>10}{'writes/s':>10}{'read p99 ms':>13}{'write p99 ms':>14}{'errors':>8}")
+    for name, pragmas, pool_size, max_overflow, read_pool_size in configs:
+        with tempfile.TemporaryDirectory() as tmp:
+            r = await _run(os.path.join(tmp, "bench.db"), pragmas, pool_size, max_overflow, read_pool_size, args)
+        print(
+            f"{name:<12}{r['reads_per_s']:>10.0f}{r['writes_per_s']:>10.0f}"
+            f"{r['read_p99_ms']:>13.2f}{r['write_p99_ms']:>14.2f}{r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args))
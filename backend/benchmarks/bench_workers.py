@@ -0,0 +1,183 @@
+"""
+Load test: throughput of `python -m serve` as the worker count grows.
+
+For each worker count, the test starts `serve` on a temporary SQLite file
+and registers and logs in a user. It then sends GET /get_user_details from
+`--clients` load-generator processes. Each process keeps `--connections`
+keep-alive connections busy for `--seconds`. That endpoint covers the
+per-request CPU work: JWT verification, rate limiting, a profile cache hit
+and the response.
+
+The table reports requests/s, p50/p99 latency and the speed-up over the
+first worker count. The per-user rate limit is lifted for the test.
+
+The load generator runs on the same machine. Keep the worker counts to
+about half the cores, or the server and the clients compete for CPU and
+the curve flattens early.
+
+    cd backend && python -m benchmarks.bench_workers [--workers 1,2,4] [--clients 2] [--connections 32] [--seconds 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = "127.0.0.1"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def _post(url: str, body: dict) -> dict:
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def _percentile(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+
+async def _connection(port: int, request: bytes, deadline: float, latencies: list[float]) -> int:
+    """Send `request` back to back on one keep-alive connection; returns the number of errors."""
+    errors = 0
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line[:15].lower() == b"content-length:":
+                    length = int(line[15:])
+            await reader.readexactly(length)
+            if head[9:12] == b"200":
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+    finally:
+        writer.close()
+    return errors
+
+
+def _client(port: int, token: str, connections: int, seconds: float) -> tuple[list[float], int]:
+    """One load-generator process: (latencies of successful requests, errors)."""
+    request = (
+        f"GET /get_user_details HTTP/1.1\r\nHost: {HOST}:{port}\r\n"
+        f"Authorization: Bearer {token}\r\n\r\n"
+    ).encode("ascii")
+
+    async def run():
+        latencies = []
+        deadline = time.perf_counter() + seconds
+        errors = await asyncio.gather(*(_connection(port, request, deadline, latencies) for _ in range(connections)))
+        return latencies, sum(errors)
+
+    return asyncio.run(run())
+
+
+def _start_server(workers: int, port: int, env: dict, timeout: float) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "serve", "--workers", str(workers), "--host", HOST, "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    started = time.perf_counter()
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with status {server.returncode}")
+        if time.perf_counter() - started > timeout:
+            server.terminate()
+            raise RuntimeError(f"server did not answer within {timeout}s")
+        try:
+            urllib.request.urlopen(f"http://{HOST}:{port}/.well-known/jwks.json", timeout=5).close()
+            return server
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.05)
+
+
+def _run(workers: int, env: dict, args) -> dict:
+    from crypto_utils import encrypt_payload_v2
+
+    port = _free_port()
+    server = _start_server(workers, port, env, args.timeout)
+    try:
+        base = f"http://{HOST}:{port}"
+        credentials = {"username": "bench", "email": "bench@example.com", "password": "bench"}
+        _post(f"{base}/auth/register", {"encrypted": encrypt_payload_v2(credentials)})
+        token = _post(f"{base}/auth/login", {"encrypted": encrypt_payload_v2(credentials)})["access_token"]
+
+        with ProcessPoolExecutor(max_workers=args.clients) as pool:
+            # A short warm-up, so each worker has the profile cached
+            for future in [pool.submit(_client, port, token, 2, 0.5) for _ in range(args.clients)]:
+                future.result()
+            started = time.perf_counter()
+            futures = [pool.submit(_client, port, token, args.connections, args.seconds) for _ in range(args.clients)]
+            results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=args.timeout)
+
+    latencies = [latency for result, _ in results for latency in result]
+    return {
+        "requests_per_s": len(latencies) / elapsed,
+        "p50_ms"        : _percentile(latencies, 50) * 1000,
+        "p99_ms"        : _percentile(latencies, 99) * 1000,
+        "errors"        : sum(errors for _, errors in results),
+    }
+
+
+def main(args):
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+    worker_counts = [int(n) for n in args.workers.split(",")]
+    print(
+        f"{os.cpu_count()} CPUs, {args.clients} client processes x {args.connections} connections, "
+        f"{args.seconds}s per run"
+    )
+    print(f"{'workers':<9}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'speed-up':>10}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in worker_counts:
+            env = {
+                **os.environ,
+                "SQLITE_PATH"       : os.path.join(tmp, f"workers-{workers}.db"),
+                "RATE_LIMIT_USER"   : str(10**9),
+            }
+            r = _run(workers, env, args)
+            baseline = baseline or r["requests_per_s"]
+            print(
+                f"{workers:<9}{r['requests_per_s']:>10.0f}{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+                f"{r['errors']:>8}{r['requests_per_s'] / baseline:>9.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    default_workers = ",".join(str(n) for n in (1, 2, 4, 8, 16) if n <= max(1, (os.cpu_count() or 1) // 2)) or "1"
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", default=default_workers, help="comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--connections", type=int, default=32, help="connections per client process")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=60)
+    main(parser.parse_args())
@@ -0,0 +1,172 @@
+"""
+Cold-start report and budget check.
+
+Measures, each in a fresh interpreter:
+
+- import time of `main` (python -X importtime), with the slowest modules
+  the app imports directly;
+- time from spawning `uvicorn main:app` to its first response (startup plus
+  lifespan: engine creation, schema/index creation);
+- latency of the first /auth/login, which pays for everything loaded or
+  connected on first use (cipher libraries, the first database connection).
+
+The median of `--runs` runs is reported. The command exits with status 1
+when the import time or the time to first response is over its budget, so
+it can gate CI the same way `benchmarks.microbench --compare` does
+(tests/test_cold_start.py only checks what `import main` loads). The
+server runs against a temporary SQLite file unless DATABASE_TYPE=mongo is
+set (then MONGO_URL must point at a reachable server), with rate limits
+and revocations in temporary shm tables.
+
+    cd backend && python -m benchmarks.cold_start [--runs 5] [--budget-import-ms 1500] [--budget-ready-ms 3000]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+BUDGET_IMPORT_MS    = 1500
+BUDGET_READY_MS     = 3000
+
+
+def _import_profile(env: dict) -> tuple[float, list[tuple[str, float]]]:
+    """(import time of main in ms, [(direct child of main, cumulative ms)])."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    children = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if name == "main" and not indent:
+            return int(cumulative) / 1000, sorted(children, key=lambda c: -c[1])
+        if len(indent) == 2:
+            children.append((name, int(cumulative) / 1000))
+        elif not indent:
+            children = []   # imported before main (site, encodings, ...)
+    raise RuntimeError("`import main` did not show up in the -X importtime output")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _request(url: str, body: dict | None = None) -> int:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+
+
+def _server_profile(env: dict, timeout: float) -> tuple[float, float]:
+    """(ms from spawn to first response, ms of the first login request)."""
+    from crypto_utils import encrypt_payload_v2
+
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with status {server.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"server did not answer within {timeout}s")
+            try:
+                _request(f"{base}/.well-known/jwks.json")
+                break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        ready = time.perf_counter() - started
+
+        login = {"encrypted": encrypt_payload_v2({"username": "cold-start", "password": "cold-start"})}
+        login_started = time.perf_counter()
+        status = _request(f"{base}/auth/login", login)
+        first_login = time.perf_counter() - login_started
+        if status != 401:
+            raise RuntimeError(f"first login returned {status}, expected 401")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return ready * 1000, first_login * 1000
+
+
+def measure(runs: int = 5, timeout: float = 60) -> dict:
+    """Medians over `runs` fresh interpreters, in ms, plus the slowest imports of the last run."""
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+    imports, ready, first_login = [], [], []
+    children = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(runs):
+            env = {
+                **os.environ,
+                "SQLITE_PATH"               : os.path.join(tmp, f"cold-start-{run}.db"),
+                "RATE_LIMIT_STORAGE_URI"    : f"shm://{os.path.join(tmp, f'ratelimit-{run}.shm')}",
+                "REVOCATION_STORAGE_URI"    : f"shm://{os.path.join(tmp, f'revocation-{run}.shm')}",
+            }
+            total, children = _import_profile(env)
+            imports.append(total)
+            r, l = _server_profile(env, timeout)
+            ready.append(r)
+            first_login.append(l)
+    return {
+        "import_ms"         : statistics.median(imports),
+        "ready_ms"          : statistics.median(ready),
+        "first_login_ms"    : statistics.median(first_login),
+        "children"          : children,
+    }
+
+
+def main(args) -> int:
+    result = measure(args.runs, args.timeout)
+    import_ms = result["import_ms"]
+    ready_ms = result["ready_ms"]
+    print(f"import main            {import_ms:>8.0f} ms   (budget {args.budget_import_ms:.0f} ms)")
+    for name, cumulative in result["children"][:args.top]:
+        print(f"  {name:<20} {cumulative:>8.0f} ms")
+    print(f"spawn -> first response {ready_ms:>7.0f} ms   (budget {args.budget_ready_ms:.0f} ms)")
+    print(f"first /auth/login       {result['first_login_ms']:>7.0f} ms")
+
+    failed = []
+    if import_ms > args.budget_import_ms:
+        failed.append("import time")
+    if ready_ms > args.budget_ready_ms:
+        failed.append("time to first response")
+    if failed:
+        print(f"OVER BUDGET: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-import-ms", type=float, default=BUDGET_IMPORT_MS)
+    parser.add_argument("--budget-ready-ms", type=float, default=BUDGET_READY_MS)
+    parser.add_argument("--top", type=int, default=12, help="direct imports of main to list")
+    parser.add_argument("--timeout", type=float, default=60)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,240 @@
+"""
+Microbenchmark suite for the primitives every request pays for.
+
+Each case is timed call by call after a short warm-up, and reports ops/s plus
+p50/p90/p99/max latency (best of --repeat runs, by p50). Results can be saved as a JSON baseline and a later
+run compared against it; cases whose median latency got worse by more than
+--threshold percent are flagged and the process exits with status 1.
+
+    cd backend && python -m benchmarks.microbench                       # run and print
+    cd backend && python -m benchmarks.microbench --save base.json      # save a baseline
+    cd backend && python -m benchmarks.microbench --compare base.json   # flag regressions
+    cd backend && python -m benchmarks.microbench -k token --scale 0.2  # subset, fewer iterations
+
+Baselines are only comparable on the same machine and environment.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+import bcrypt
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+import crypto_utils
+import main
+from benchmarks.bench_crypto_envelope import PAYLOAD, encrypt_v1
+from schemas import APIClientListResponse, APIClientResponse, LoginResponse, UserDetailsResponse, UserResponse
+
+
+@dataclass
+class Case:
+    name        : str
+    fn          : Callable
+    iterations  : int
+
+
+def _build_cases() -> list[Case]:
+    v1_envelope = encrypt_v1(PAYLOAD)
+    v2_envelope = crypto_utils.encrypt_payload_v2(PAYLOAD)
+
+    claims = {"user_id": "1", "username": "bench", "role": "guest", "token_type": "user"}
+    token = auth.create_access_token(data=claims, expires_delta=timedelta(minutes=30))
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    hashed = bcrypt.hashpw(b"correct horse battery", bcrypt.gensalt()).decode("utf-8")
+
+    # A verified API client, as it sits in the credential cache after the first request
+    api_key, api_secret = auth.generate_client_credentials()
+    auth.api_client_cache.set(
+        (api_key, auth._client_secret_digest(api_secret)),
+        auth.APIClientData(client_id=api_key, client_name="bench"),
+    )
+
+    user_row = {"id": "1", "username": "bench", "email": "bench@example.com", "role": "guest"}
+    client_rows = [
+        {
+            "id"            : str(i),
+            "name"          : f"client-{i}",
+            "client_id"     : f"cli_{i:032x}",
+            "is_active"     : True,
+            "created_at"    : datetime.now(timezone.utc),
+        }
+        for i in range(50)
+    ]
+
+    # auth.resolve.* time get_current_user_or_api_client, the dependency
+    # behind every route that accepts either a user token or API credentials
+    async def user_cold():
+        auth.token_cache.clear()
+        await auth.get_current_user_or_api_client(None, credentials, None, None)
+
+    async def user_cached():
+        await auth.get_current_user_or_api_client(None, credentials, None, None)
+
+    async def api_client_cached():
+        await auth.get_current_user_or_api_client(None, None, api_key, api_secret)
+
+    async def unauthenticated():
+        try:
+            await auth.get_current_user_or_api_client(None, None, None, None)
+        except HTTPException:
+            pass
+
+    async def verify_password():
+        await main.verify_password("correct horse battery", hashed)
+
+    async def hash_client_secret():
+        await auth.hash_client_secret(api_secret)
+
+    def user_details_response():
+        return UserDetailsResponse(**user_row, auth_type="user").model_dump_json()
+
+    def login_response():
+        return LoginResponse(
+            access_token=token,
+            expires_in=1800,
+            user=UserResponse(**user_row),
+        ).model_dump_json()
+
+    client_list_response = lambda: APIClientListResponse(
+        clients=[APIClientResponse(**row) for row in client_rows]
+    ).model_dump_json()
+
+    return [
+        Case("crypto.decrypt_payload.v1",           lambda: crypto_utils.decrypt_payload(v1_envelope),  20000),
+        Case("crypto.decrypt_payload.v2",           lambda: crypto_utils.decrypt_payload(v2_envelope),  20000),
+        Case("auth.create_access_token",            lambda: auth.create_access_token(data=claims),      20000),
+        Case("auth.decode_token",                   lambda: auth.decode_token(token),                   20000),
+        Case("auth.resolve.user_uncached",          user_cold,                                          20000),
+        Case("auth.resolve.user_cached",            user_cached,                                        50000),
+        Case("auth.resolve.api_client_cached",      api_client_cached,                                  50000),
+        Case("auth.resolve.unauthenticated",        unauthenticated,                                    50000),
+        Case("schemas.UserResponse",                lambda: UserResponse(**user_row).model_dump_json(), 50000),
+        Case("schemas.LoginResponse",               login_response,                                     50000),
+        Case("schemas.UserDetailsResponse",         user_details_response,                              50000),
+        Case("schemas.APIClientListResponse.50",    client_list_response,                               5000),
+        Case("password.verify_password",            verify_password,                                    20),
+        Case("password.hash_client_secret",         hash_client_secret,                                 20),
+    ]
+
+
+async def _run_case(case: Case, iterations: int) -> dict:
+    fn = case.fn
+    is_async = inspect.iscoroutinefunction(fn)
+    warmup = max(1, iterations // 10)
+
+    samples = []
+    perf_counter_ns = time.perf_counter_ns
+    for i in range(warmup + iterations):
+        started = perf_counter_ns()
+        if is_async:
+            await fn()
+        else:
+            fn()
+        if i >= warmup:
+            samples.append(perf_counter_ns() - started)
+
+    samples.sort()
+    total_s = sum(samples) / 1e9
+
+    def percentile(p: float) -> float:
+        return samples[min(len(samples) - 1, int(p / 100 * len(samples)))] / 1000
+
+    return {
+        "iterations"    : iterations,
+        "ops_per_sec"   : iterations / total_s,
+        "p50_us"        : percentile(50),
+        "p90_us"        : percentile(90),
+        "p99_us"        : percentile(99),
+        "max_us"        : samples[-1] / 1000,
+    }
+
+
+def _environment() -> dict:
+    return {
+        "python"        : platform.python_version(),
+        "platform"      : platform.platform(),
+        "cpu_count"     : os.cpu_count(),
+        "jwt_algorithm" : auth.JWT_ALGORITHM,
+        "timestamp"     : datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _print_results(results: dict, baseline: dict | None, threshold: float) -> list[str]:
+    regressions = []
+    header = f"{'case':<40}{'ops/s':>10}{'p50 us':>12}{'p90 us':>12}{'p99 us':>12}{'max us':>12}"
+    if baseline:
+        header += f"{'p50 vs base':>14}"
+    print(header)
+
+    for name, r in results.items():
+        line = (
+            f"{name:<40}{r['ops_per_sec']:>10.0f}{r['p50_us']:>12.2f}"
+            f"{r['p90_us']:>12.2f}{r['p99_us']:>12.2f}{r['max_us']:>12.2f}"
+        )
+        base = (baseline or {}).get(name)
+        if base:
+            change = (r["p50_us"] - base["p50_us"]) / base["p50_us"] * 100
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions.append(name)
+            line += f"{change:>+13.1f}%{flag}"
+        elif baseline:
+            line += f"{'new':>14}"
+        print(line)
+
+    return regressions
+
+
+async def run(args):
+    cases = [c for c in _build_cases() if not args.k or any(k in c.name for k in args.k)]
+    results = {}
+    for case in cases:
+        iterations = max(1, int(case.iterations * args.scale))
+        runs = [await _run_case(case, iterations) for _ in range(args.repeat)]
+        results[case.name] = min(runs, key=lambda r: r["p50_us"])
+    main.password_hasher.shutdown()
+    return results
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-k", action="append", help="only run cases whose name contains this (repeatable)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every case's iteration count")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the one with the lowest p50 is kept")
+    parser.add_argument("--save", metavar="PATH", help="write results to a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p50 slowdown, in percent, counted as a regression")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = asyncio.run(run(args))
+    regressions = _print_results(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"environment": _environment(), "results": results}, f, indent=2)
+        print(f"\nbaseline written to {args.save}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,213 @@
+"""
+Query-plan check: every repository query must be served by an index.
+
+Calls each UserRepository / APIClientRepository method against a scratch
+database, records the statements (SQLite) or commands (Mongo) it sends, and
+asks the query planner how it runs each of them:
+
+- SQLite: EXPLAIN QUERY PLAN; any "SCAN" step (a full table or full index
+  scan) fails the check;
+- Mongo: the explain command (queryPlanner verbosity); any COLLSCAN stage
+  in the winning plan fails the check.
+
+Plain inserts are not checked. The command exits with status 1 when a query
+scans, so it can gate CI like `benchmarks.cold_start`. SQLite runs against
+a temporary file; Mongo needs MONGO_URL to point at a reachable server, and
+uses a scratch database that is dropped afterwards.
+
+    cd backend && python -m benchmarks.query_plans [--database sqlite|mongo]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Mongo commands that run a query; inserts have no plan
+EXPLAINABLE_COMMANDS = {"find", "findAndModify", "update", "delete", "aggregate", "count", "distinct"}
+# Session and routing fields the driver adds, which explain does not accept
+DRIVER_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction"}
+
+
+async def _exercise(record_label):
+    """Call every repository method once; record_label(name) tags the queries that follow."""
+    from repositories import user_repository, api_client_repository
+
+    record_label("UserRepository.create")
+    user = await user_repository.create("plan_user", "plan_user@example.com", "guest", "x")
+    record_label("UserRepository.bulk_create")
+    await user_repository.bulk_create([
+        {"username": "plan_user", "email": "plan_other@example.com", "role": "guest", "hashed_password": "x"},
+        {"username": "plan_bulk", "email": "plan_bulk@example.com", "role": "guest", "hashed_password": "x"},
+    ])
+    record_label("UserRepository.find_by_username")
+    await user_repository.find_by_username("plan_user")
+    record_label("UserRepository.find_by_id")
+    await user_repository.find_by_id(user.id)
+    record_label("UserRepository.update_role")
+    await user_repository.update_role(user.id, "admin")
+
+    record_label("APIClientRepository.create")
+    client = await api_client_repository.create("plan", "cli_plan", "x", user.id)
+    record_label("APIClientRepository.find_active_by_client_id")
+    await api_client_repository.find_active_by_client_id("cli_plan")
+    record_label("APIClientRepository.find_page_by_user")
+    await api_client_repository.find_page_by_user(user.id, 10)
+    record_label("APIClientRepository.find_page_by_user(after)")
+    await api_client_repository.find_page_by_user(user.id, 10, (client.created_at, client.id))
+    record_label("APIClientRepository.deactivate")
+    await api_client_repository.deactivate("cli_plan", user.id)
+
+
+# ============================================================================
+# SQLite
+# ============================================================================
+
+async def _sqlite_plans(path: str) -> list[tuple[str, str, list[str]]]:
+    """[(repository method, statement, EXPLAIN QUERY PLAN details)]."""
+    from sqlalchemy import event
+    import database
+    import models  # noqa: F401
+
+    database.init_engines()
+    async with database.async_engine.begin() as conn:
+        await conn.run_sync(database.create_schema)
+
+    label = None
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((label, statement, parameters))
+
+    engines = {database.async_engine.sync_engine, database.async_read_engine.sync_engine}
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+
+    def record_label(name):
+        nonlocal label
+        label = name
+
+    try:
+        await _exercise(record_label)
+    finally:
+        await database.dispose_engines()
+
+    plans = []
+    with sqlite3.connect(path) as conn:
+        for name, statement, parameters in statements:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            plans.append((name, " ".join(statement.split()), [row[-1] for row in rows]))
+    return plans
+
+
+def _sqlite_scans(details: list[str]) -> list[str]:
+    return [d for d in details if d.startswith("SCAN ") and d != "SCAN CONSTANT ROW"]
+
+
+# ============================================================================
+# MongoDB
+# ============================================================================
+
+def _plan_stages(plan) -> list[str]:
+    """Every stage name in an explain() plan tree."""
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _plan_stages(item)]
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    for value in plan.values():
+        stages.extend(_plan_stages(value))
+    return stages
+
+
+async def _mongo_plans(db_name: str) -> list[tuple[str, str, list[str]]]:
+    """[(repository method, command, winning plan stages)]."""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo import monitoring
+    import database_mongo
+    from models_mongo import UserCollection, APIClientCollection
+
+    label = None
+    commands = []
+
+    class Recorder(monitoring.CommandListener):
+        def started(self, event):
+            if event.command_name in EXPLAINABLE_COMMANDS:
+                command = {
+                    key: value for key, value in event.command.items()
+                    if not key.startswith("$") and key not in DRIVER_FIELDS
+                }
+                commands.append((label, command))
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    def record_label(name):
+        nonlocal label
+        label = name
+
+    client = AsyncIOMotorClient(database_mongo.MONGO_URL, event_listeners=[Recorder()])
+    # Repositories reach the database through database_mongo.get_database()
+    database_mongo.client = client
+    database_mongo.db = db = client[db_name]
+    try:
+        await UserCollection.create_indexes(db)
+        await APIClientCollection.create_indexes(db)
+        await _exercise(record_label)
+
+        recorded, commands = commands, []
+        plans = []
+        for name, command in recorded:
+            result = await db.command({"explain": command, "verbosity": "queryPlanner"})
+            stages = _plan_stages(result["queryPlanner"]["winningPlan"])
+            plans.append((name, f"{next(iter(command))} {command}", stages))
+        return plans
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+def main(args) -> int:
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+    # repositories.py picks its backend from DATABASE_TYPE when imported
+    os.environ["DATABASE_TYPE"] = args.database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.database == "mongo":
+            plans = asyncio.run(_mongo_plans(f"{os.getenv('MONGO_DB_NAME', 'learning_scheduler')}_query_plans"))
+            scans = {i: [s for s in stages if s == "COLLSCAN"] for i, (_, _, stages) in enumerate(plans)}
+        else:
+            path = os.path.join(tmp, "query-plans.db")
+            os.environ["SQLITE_PATH"] = path
+            plans = asyncio.run(_sqlite_plans(path))
+            scans = {i: _sqlite_scans(details) for i, (_, _, details) in enumerate(plans)}
+
+    for i, (name, query, plan) in enumerate(plans):
+        print(f"{'SCAN' if scans[i] else 'ok':<6}{name}")
+        if args.verbose or scans[i]:
+            print(f"      {query}")
+            for step in plan:
+                print(f"        {step}")
+
+    scanning = sorted({plans[i][0] for i, found in scans.items() if found})
+    if scanning:
+        print(f"FAILED: {len(scanning)} method(s) scan: {', '.join(scanning)}")
+        return 1
+    print(f"{len(plans)} queries, all served by an index")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database", choices=("sqlite", "mongo"), default=os.getenv("DATABASE_TYPE", "sqlite"))
+    parser.add_argument("--verbose", "-v", action="store_true", help="print every plan, not only scans")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,265 @@
+"""
+Bulk user import from CSV or NDJSON.
+
+Rows are streamed; nothing larger than one batch is held in memory. Each
+batch is hashed through a PasswordHasher, at most BULK_IMPORT_WORKERS
+passwords at a time, then inserted with a single batched statement through
+`user_repository.bulk_create`:
+
+- SQLite: executemany with ON CONFLICT DO NOTHING;
+- Mongo: insert_many(ordered=False).
+
+A duplicate or invalid row is reported by line number and the rest of its
+batch still goes in.
+
+CSV needs a header with username, email and password (role is optional).
+NDJSON has one {"username", "email", "password", "role"?} object per line.
+
+    cd backend && python -m bulk_import users.csv [--format csv|ndjson] [--batch-size 500] [--workers N]
+
+The same import is available to admins as POST /admin/users/import. It
+shares the server's `password_hasher`, so it is bound by the same pool and
+admission control as logins; when the pool is full the import waits and
+retries instead of failing.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+
+from password_hasher import PasswordHasher, password_hasher
+
+BULK_IMPORT_BATCH_SIZE      = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "500"))
+BULK_IMPORT_WORKERS         = int(os.getenv("BULK_IMPORT_WORKERS", str(os.cpu_count() or 1)))
+BULK_IMPORT_MAX_ERRORS      = int(os.getenv("BULK_IMPORT_MAX_ERRORS", "1000"))
+DEFAULT_ROLE                = "guest"
+
+REQUIRED_FIELDS             = ("username", "email", "password")
+
+
+@dataclass
+class ImportReport:
+    total       : int = 0
+    created     : int = 0
+    failed      : int = 0
+    errors      : list[dict] = field(default_factory=list)
+    seconds     : float = 0.0
+
+    def add_error(self, line: int, username: Optional[str], error: str):
+        self.failed += 1
+        if len(self.errors) < BULK_IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "username": username, "error": error})
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines without buffering all of it; lines are decoded by iter_rows."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if pending:
+        yield pending.rstrip(b"\r")
+
+
+async def iter_rows(lines: AsyncIterator[bytes], fmt: str) -> AsyncIterator[tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Yield (line number, row, parse error) for every non-empty record. A CSV
+    record may span several lines inside a quoted field; it is reported by
+    its first line. A line that is not UTF-8 is an error of its own.
+    """
+    header = None
+    record: Optional[str] = None
+    record_line = 0
+    line_no = 0
+    async for raw in lines:
+        line_no += 1
+        try:
+            line = raw.decode("utf-8")
+        except UnicodeDecodeError as exc:
+            if record is not None:
+                yield record_line, None, "Unparseable row: a line of this record is not valid UTF-8"
+                record = None
+            yield line_no, None, f"Unparseable row: not valid UTF-8 at byte {exc.start}"
+            continue
+
+        if fmt == "ndjson":
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as exc:
+                yield line_no, None, f"Unparseable row: {exc}"
+                continue
+            yield line_no, row, None
+            continue
+
+        if record is None:
+            if not line.strip():
+                continue
+            record, record_line = line, line_no
+        else:
+            record += "\n" + line
+        # An odd number of quotes leaves a quoted field open: the record goes on
+        if record.count('"') % 2:
+            continue
+        text, record = record, None
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as exc:
+            yield record_line, None, f"Unparseable row: {exc}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield record_line, dict(zip(header, values)), None
+
+    if record is not None:
+        yield record_line, None, "Unparseable row: unterminated quoted field"
+
+
+def _validate(row: dict) -> Optional[str]:
+    missing = [name for name in REQUIRED_FIELDS if not row.get(name)]
+    if missing:
+        return f"Missing {', '.join(missing)}"
+    if len(str(row["password"]).encode("utf-8")) > 72:
+        return "Password too long (max 72 bytes)"
+    return None
+
+
+class BulkImporter:
+
+    def __init__(
+        self,
+        batch_size: int = BULK_IMPORT_BATCH_SIZE,
+        workers: int = BULK_IMPORT_WORKERS,
+        default_role: str = DEFAULT_ROLE,
+        hasher: PasswordHasher = password_hasher,
+    ):
+        self.batch_size     = max(1, batch_size)
+        # Passwords hashed at once; more than the pool's workers would only queue
+        self.workers        = max(1, min(workers, hasher.workers))
+        self.default_role   = default_role
+        self.hasher         = hasher
+
+    async def run(self, lines: AsyncIterator[bytes], fmt: str) -> ImportReport:
+        # Imported here so the CLI can load .env (DATABASE_TYPE) first
+        from repositories import user_repository, DUPLICATE_FIELD_MESSAGES
+
+        report = ImportReport()
+        started = time.perf_counter()
+        batch: list[tuple[int, dict]] = []
+
+        async for line_no, row, error in iter_rows(lines, fmt):
+            report.total += 1
+            error = error or _validate(row)
+            if error:
+                report.add_error(line_no, (row or {}).get("username"), error)
+                continue
+            batch.append((line_no, row))
+            if len(batch) >= self.batch_size:
+                await self._flush(batch, user_repository, DUPLICATE_FIELD_MESSAGES, report)
+                batch = []
+        await self._flush(batch, user_repository, DUPLICATE_FIELD_MESSAGES, report)
+
+        report.errors.sort(key=lambda error: error["line"])
+        report.seconds = time.perf_counter() - started
+        return report
+
+    async def _hash(self, password: str, slots: asyncio.Semaphore) -> str:
+        async with slots:
+            while True:
+                try:
+                    return await self.hasher.hash(password)
+                except HTTPException as exc:
+                    # The pool is full: let interactive requests through first
+                    if exc.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+                        raise
+                    await asyncio.sleep(self.hasher.retry_after)
+
+    async def _flush(self, batch, user_repository, messages: dict, report: ImportReport):
+        if not batch:
+            return
+        slots = asyncio.Semaphore(self.workers)
+        hashes = await asyncio.gather(*(self._hash(str(row["password"]), slots) for _, row in batch))
+        users = [
+            {
+                "username"          : str(row["username"]),
+                "email"             : str(row["email"]),
+                "role"              : row.get("role") or self.default_role,
+                "hashed_password"   : hashed,
+            }
+            for (_, row), hashed in zip(batch, hashes)
+        ]
+
+        duplicates = await user_repository.bulk_create(users)
+        report.created += len(users) - len(duplicates)
+        for index, duplicate_field in sorted(duplicates.items()):
+            line_no, row = batch[index]
+            message = messages.get(duplicate_field, "Duplicate user")
+            report.add_error(line_no, row["username"], message)
+
+
+async def _file_chunks(path: str) -> AsyncIterator[bytes]:
+    with (sys.stdin.buffer if path == "-" else open(path, "rb")) as f:
+        while chunk := f.read(65536):
+            yield chunk
+
+
+async def _main(args):
+    from config import DATABASE_TYPE
+
+    if DATABASE_TYPE == "mongo":
+        from database_mongo import connect_to_mongo, close_mongo_connection, get_database
+        from models_mongo import UserCollection
+        await connect_to_mongo()
+        await UserCollection.create_indexes(get_database())
+    else:
+        import database
+        import models  # noqa: F401
+        database.init_engines()
+        async with database.async_engine.begin() as conn:
+            await conn.run_sync(database.create_schema)
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    # Not the server's pool: the CLI has every core to itself
+    hasher = PasswordHasher(workers=args.workers)
+    importer = BulkImporter(args.batch_size, args.workers, args.role, hasher)
+    try:
+        report = await importer.run(iter_lines(_file_chunks(args.path)), fmt)
+    finally:
+        await asyncio.get_running_loop().run_in_executor(None, hasher.shutdown)
+        if DATABASE_TYPE == "mongo":
+            await close_mongo_connection()
+        else:
+            await database.dispose_engines()
+
+    for error in report.errors:
+        print(f"line {error['line']}: {error['username']}: {error['error']}", file=sys.stderr)
+    print(
+        f"{report.created} created, {report.failed} failed, {report.total} rows "
+        f"in {report.seconds:.1f}s ({report.total / max(report.seconds, 1e-9):.0f} rows/s)"
+    )
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", help="CSV or NDJSON file, or - for stdin")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=BULK_IMPORT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=BULK_IMPORT_WORKERS)
+    parser.add_argument("--role", default=DEFAULT_ROLE, help="role for rows without one")
+    asyncio.run(_main(parser.parse_args()))
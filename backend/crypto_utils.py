@@ -1,18 +1,102 @@
+"""
+Decryption of the `encrypted` field sent by the frontend on register/login.
+
+Two envelope versions are accepted:
+
+- v1: CryptoJS / OpenSSL "Salted__" format (base64). The AES-CBC key and IV
+  are derived per request from ENCRYPTION_KEY and the salt with
+  EVP_BytesToKey; there is no integrity check.
+- v2: "v2." + base64(nonce || ciphertext || tag), AES-256-GCM with a 12-byte
+  random nonce. The key is derived once, on first use, as
+  HKDF-SHA256(ENCRYPTION_KEY, info=PAYLOAD_V2_INFO).
+
+Set ENCRYPTION_V1_ENABLED=false once every client sends v2. The cipher
+libraries (pycryptodome for v1, cryptography for v2) are imported on first
+use of their envelope, which keeps them out of the app's startup.
+"""
 import base64
 import hashlib
 import json
 import os
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
+import time
+
+from metrics import PHASE_DURATION
+
+ENCRYPTION_KEY          = os.getenv("ENCRYPTION_KEY", "")
+ENCRYPTION_V1_ENABLED   = os.getenv("ENCRYPTION_V1_ENABLED", "true").lower() == "true"
+
+PAYLOAD_V2_PREFIX       = "v2."
+PAYLOAD_V2_INFO         = b"nextapi-payload-v2"
+PAYLOAD_V2_NONCE_SIZE   = 12
+
+
+def derive_v2_key(secret: str) -> bytes:
+    """AES-256 key for v2 envelopes; must match the frontend's derivation."""
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=PAYLOAD_V2_INFO,
+    ).derive(secret.encode("utf-8"))
+
+
+_v2_cipher = None
+
 
-ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", "")
+def _get_v2_cipher():
+    global _v2_cipher
+    if _v2_cipher is None:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        _v2_cipher = AESGCM(derive_v2_key(ENCRYPTION_KEY))
+    return _v2_cipher
 
 
 def decrypt_payload(encrypted_data: str) -> dict:
+    """Decrypt a v1 or v2 envelope and return the JSON payload."""
+    started = time.perf_counter()
+    try:
+        if encrypted_data.startswith(PAYLOAD_V2_PREFIX):
+            return decrypt_payload_v2(encrypted_data)
+        if not ENCRYPTION_V1_ENABLED:
+            raise ValueError("v1 encrypted payloads are disabled")
+        return decrypt_payload_v1(encrypted_data)
+    finally:
+        PHASE_DURATION.observe(time.perf_counter() - started, "decrypt")
+
+
+def decrypt_payload_v2(encrypted_data: str) -> dict:
+    """
+    Decrypt an AES-256-GCM envelope. Raises `cryptography.exceptions.InvalidTag`
+    if the ciphertext was tampered with or encrypted under another key.
+    """
+    raw = base64.b64decode(encrypted_data[len(PAYLOAD_V2_PREFIX):])
+    if len(raw) <= PAYLOAD_V2_NONCE_SIZE + 16:
+        raise ValueError("Invalid encrypted data format")
+
+    nonce = raw[:PAYLOAD_V2_NONCE_SIZE]
+    decrypted = _get_v2_cipher().decrypt(nonce, raw[PAYLOAD_V2_NONCE_SIZE:], None)
+
+    return json.loads(decrypted)
+
+
+def encrypt_payload_v2(data: dict) -> str:
+    """Build a v2 envelope (for tooling and benchmarks; the frontend has its own)."""
+    nonce = os.urandom(PAYLOAD_V2_NONCE_SIZE)
+    ciphertext = _get_v2_cipher().encrypt(nonce, json.dumps(data).encode("utf-8"), None)
+    return PAYLOAD_V2_PREFIX + base64.b64encode(nonce + ciphertext).decode("ascii")
+
+
+def decrypt_payload_v1(encrypted_data: str) -> dict:
     """
     Decrypt data encrypted by CryptoJS AES.
     CryptoJS uses OpenSSL-compatible format with "Salted__" prefix.
     """
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import unpad
+
     raw = base64.b64decode(encrypted_data)
 
     if raw[:8] != b"Salted__":
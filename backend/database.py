@@ -1,21 +1,166 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import os
+from typing import Optional
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from metrics import METRICS_ENABLED, instrument_sqlalchemy
+
+SQLITE_PATH                     = os.getenv("SQLITE_PATH", "./app.db")
+SQLALCHEMY_ASYNC_DATABASE_URL   = f"sqlite+aiosqlite:///{SQLITE_PATH}"
+
+# "default" keeps SQLite's own settings; "production" enables WAL and the
+# pragmas below. Every individual setting can still be overridden.
+SQLITE_PROFILE                  = os.getenv("SQLITE_PROFILE", "default")
+
+_PROFILES = {
+    "default": {
+        "journal_mode"  : "",
+        "synchronous"   : "",
+        "mmap_size"     : "",
+        "cache_size"    : "",
+        "busy_timeout"  : "5000",
+        "pool_size"     : "5",
+        "max_overflow"  : "10",
+        "read_pool_size": "0",
+    },
+    "production": {
+        "journal_mode"  : "WAL",
+        "synchronous"   : "NORMAL",
+        "mmap_size"     : str(256 * 1024 * 1024),
+        "cache_size"    : str(-64 * 1024),         # negative = KiB, i.e. 64 MiB per connection
+        "busy_timeout"  : "5000",
+        "pool_size"     : "1",                      # SQLite has a single writer
+        "max_overflow"  : "0",
+        "read_pool_size": "8",
+    },
+}
+_profile = _PROFILES[SQLITE_PROFILE]
+
+SQLITE_JOURNAL_MODE             = os.getenv("SQLITE_JOURNAL_MODE", _profile["journal_mode"])
+SQLITE_SYNCHRONOUS              = os.getenv("SQLITE_SYNCHRONOUS", _profile["synchronous"])
+SQLITE_MMAP_SIZE                = os.getenv("SQLITE_MMAP_SIZE", _profile["mmap_size"])
+SQLITE_CACHE_SIZE               = os.getenv("SQLITE_CACHE_SIZE", _profile["cache_size"])
+SQLITE_BUSY_TIMEOUT_MS          = os.getenv("SQLITE_BUSY_TIMEOUT_MS", _profile["busy_timeout"])
+SQLITE_POOL_SIZE                = int(os.getenv("SQLITE_POOL_SIZE", _profile["pool_size"]))
+SQLITE_MAX_OVERFLOW             = int(os.getenv("SQLITE_MAX_OVERFLOW", _profile["max_overflow"]))
+SQLITE_POOL_TIMEOUT             = float(os.getenv("SQLITE_POOL_TIMEOUT", "30"))
+# Separate read-only pool for lookups; 0 sends lookups through the main pool
+SQLITE_READ_POOL_SIZE           = int(os.getenv("SQLITE_READ_POOL_SIZE", _profile["read_pool_size"]))
+
+
+def sqlite_pragmas(
+    journal_mode: str = SQLITE_JOURNAL_MODE,
+    synchronous: str = SQLITE_SYNCHRONOUS,
+    mmap_size: str = SQLITE_MMAP_SIZE,
+    cache_size: str = SQLITE_CACHE_SIZE,
+    busy_timeout: str = SQLITE_BUSY_TIMEOUT_MS,
+    read_only: bool = False,
+) -> dict[str, str]:
+    """PRAGMAs to run on every new connection (unset values are skipped)."""
+    pragmas = {
+        "journal_mode"  : journal_mode,
+        "synchronous"   : synchronous,
+        "mmap_size"     : mmap_size,
+        "cache_size"    : cache_size,
+        "busy_timeout"  : busy_timeout,
+        "query_only"    : "ON" if read_only else "",
+    }
+    return {name: value for name, value in pragmas.items() if value}
+
+
+def apply_pragmas(engine, pragmas: dict[str, str]):
+    """Run `pragmas` on each new DBAPI connection of `engine` (sync engine or an async one's sync_engine)."""
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_sqlite_async_engine(
+    url: str = SQLALCHEMY_ASYNC_DATABASE_URL,
+    pragmas: dict[str, str] | None = None,
+    pool_size: int = SQLITE_POOL_SIZE,
+    max_overflow: int = SQLITE_MAX_OVERFLOW,
+    pool_timeout: float = SQLITE_POOL_TIMEOUT,
+) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+    )
+    apply_pragmas(engine.sync_engine, sqlite_pragmas() if pragmas is None else pragmas)
+    if METRICS_ENABLED:
+        instrument_sqlalchemy(engine.sync_engine)
+    return engine
+
+
+# Engines and session factories are created by init_engines(), which the app
+# calls from its lifespan (and CLI tools call before use), not at import time.
+async_engine            : Optional[AsyncEngine] = None
+AsyncSessionLocal       : Optional[async_sessionmaker] = None
+async_read_engine       : Optional[AsyncEngine] = None
+AsyncReadSessionLocal   : Optional[async_sessionmaker] = None
+
+
+def init_engines():
+    """Create the engines and session factories (idempotent)."""
+    global async_engine, AsyncSessionLocal, async_read_engine, AsyncReadSessionLocal
+    if async_engine is not None:
+        return
+
+    async_engine = create_sqlite_async_engine()
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+    # Lookups (login, API client auth, user details, listings) go through the
+    # read pool when there is one. With WAL, its readers never wait on a writer.
+    if SQLITE_READ_POOL_SIZE > 0:
+        async_read_engine = create_sqlite_async_engine(
+            pragmas=sqlite_pragmas(read_only=True),
+            pool_size=SQLITE_READ_POOL_SIZE,
+            max_overflow=0,
+        )
+        AsyncReadSessionLocal = async_sessionmaker(
+            async_read_engine, autoflush=False, expire_on_commit=False
+        )
+    else:
+        async_read_engine = async_engine
+        AsyncReadSessionLocal = AsyncSessionLocal
+
+
+async def dispose_engines():
+    """Close every pooled connection; init_engines() may be called again afterwards."""
+    global async_engine, AsyncSessionLocal, async_read_engine, AsyncReadSessionLocal
+    if async_engine is None:
+        return
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+    async_engine = AsyncSessionLocal = async_read_engine = AsyncReadSessionLocal = None
 
 
 class Base(DeclarativeBase):
     pass
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def create_schema(connection):
+    """
+    create_all, plus any index added to a model after its table was created
+    (create_all skips existing tables together with their indexes), minus
+    the indexes retired from the schema.
+    """
+    from indexes import RETIRED_INDEXES
+
+    Base.metadata.create_all(connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    for name in RETIRED_INDEXES:
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
@@ -1,20 +1,53 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import Optional
+import asyncio
 import os
 
+from metrics import METRICS_ENABLED, mongo_command_listener, mongo_pool_listener
+
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "learning_scheduler")
 
+# Pool sizing; unset values keep the driver defaults (100 max, 0 min, no idle
+# limit, wait for a connection until the server selection timeout).
+MONGO_MAX_POOL_SIZE             = os.getenv("MONGO_MAX_POOL_SIZE", "")
+MONGO_MIN_POOL_SIZE             = os.getenv("MONGO_MIN_POOL_SIZE", "")
+MONGO_MAX_IDLE_TIME_MS          = os.getenv("MONGO_MAX_IDLE_TIME_MS", "")
+MONGO_WAIT_QUEUE_TIMEOUT_MS     = os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "")
+# Connections opened by warm_up() before the app starts serving
+MONGO_WARMUP_CONNECTIONS        = int(os.getenv("MONGO_WARMUP_CONNECTIONS", MONGO_MIN_POOL_SIZE or "1"))
+
 client: Optional[AsyncIOMotorClient] = None
 db = None
 
 
+def pool_options() -> dict:
+    """Client keyword arguments for the MONGO_* pool settings that are set."""
+    options = {
+        "maxPoolSize"           : MONGO_MAX_POOL_SIZE,
+        "minPoolSize"           : MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS"         : MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS"    : MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    }
+    return {name: int(value) for name, value in options.items() if value}
+
+
 async def connect_to_mongo():
     global client, db
-    client = AsyncIOMotorClient(MONGO_URL)
+    event_listeners = [mongo_command_listener(), mongo_pool_listener()] if METRICS_ENABLED else []
+    client = AsyncIOMotorClient(MONGO_URL, event_listeners=event_listeners, **pool_options())
     db = client[MONGO_DB_NAME]
 
 
+async def warm_up(connections: int = MONGO_WARMUP_CONNECTIONS):
+    """
+    Open `connections` pooled connections up front, so the first requests
+    after a deploy do not pay for connection setup (TCP, TLS, handshake,
+    auth). Concurrent pings each need a connection of their own.
+    """
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(1, connections))))
+
+
 async def close_mongo_connection():
     global client
     if client:
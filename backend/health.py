@@ -0,0 +1,186 @@
+"""
+Liveness and readiness probes (/livez, /readyz) served from a cached status.
+
+A background task refreshes the status every HEALTH_CHECK_INTERVAL seconds.
+Probes only read the result, so they cost microseconds, need no
+authentication and are not rate limited. Each refresh checks:
+
+- database: a ping that must answer within HEALTH_DB_TIMEOUT seconds
+  (SELECT 1 through the SQLite pool that serves lookups, or `ping` on
+  MongoDB);
+- pool: the share of pooled connections in use must stay below
+  HEALTH_MAX_POOL_USAGE. SQLite checks the lookup pool; the single-writer
+  pool of the production profile is busy by design. MongoDB also fails
+  when an operation is waiting for a connection, and with an unbounded
+  pool (MONGO_MAX_POOL_SIZE=0) only checks that. This reads the pool
+  listener, so it is skipped when METRICS_ENABLED=false;
+- event loop: how late the refresh task woke up must stay below
+  HEALTH_MAX_LOOP_LAG_MS.
+
+/readyz answers 503 when any of the following holds:
+- the last refresh failed a check;
+- the last refresh is older than HEALTH_STALE_AFTER seconds;
+- shutdown has begun.
+
+/livez only fails when refreshes have stopped, which means the loop or the
+task is stuck. A database outage therefore takes the worker out of rotation
+without getting it restarted. The status is per worker process.
+
+The probes are unauthenticated, so their bodies only carry a status word.
+The results of each check are in /admin/stats (details()).
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+from config import DATABASE_TYPE
+from metrics import METRICS_ENABLED
+
+HEALTH_CHECK_INTERVAL       = float(os.getenv("HEALTH_CHECK_INTERVAL", "2"))
+HEALTH_DB_TIMEOUT           = float(os.getenv("HEALTH_DB_TIMEOUT", "1"))
+HEALTH_MAX_POOL_USAGE       = float(os.getenv("HEALTH_MAX_POOL_USAGE", "1.0"))
+HEALTH_MAX_LOOP_LAG_MS      = float(os.getenv("HEALTH_MAX_LOOP_LAG_MS", "500"))
+HEALTH_STALE_AFTER          = float(os.getenv("HEALTH_STALE_AFTER", str(3 * HEALTH_CHECK_INTERVAL)))
+
+LIVE_BODY                   = b'{"status":"ok"}'
+READY_BODY                  = b'{"status":"ready"}'
+NOT_READY_BODY              = b'{"status":"not ready"}'
+STALLED_BODY                = b'{"status":"stalled"}'
+STARTING_BODY               = b'{"status":"starting"}'
+STALE_BODY                  = b'{"status":"stale"}'
+DRAINING_BODY               = b'{"status":"draining"}'
+
+
+async def _ping_database():
+    if DATABASE_TYPE == "mongo":
+        import database_mongo
+        await database_mongo.client.admin.command("ping")
+    else:
+        import database
+        async with database.async_read_engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+
+
+async def check_database() -> dict:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(_ping_database(), HEALTH_DB_TIMEOUT)
+    except Exception as exc:
+        return {"ok": False, "error": type(exc).__name__}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+def check_pool() -> dict:
+    if DATABASE_TYPE == "mongo":
+        if not METRICS_ENABLED:
+            return {"ok": True, "skipped": "METRICS_ENABLED=false"}
+        import database_mongo
+        from metrics import mongo_pool_usage
+
+        # 0 or None: the driver does not bound the pool
+        max_pool_size = database_mongo.client.options.pool_options.max_pool_size or None
+        usage = mongo_pool_usage()
+        ok = all(
+            not waiters and (max_pool_size is None or checked_out / max_pool_size < HEALTH_MAX_POOL_USAGE)
+            for checked_out, waiters in usage.values()
+        )
+        return {
+            "ok"        : ok,
+            "servers"   : {
+                address: {"in_use": checked_out, "size": max_pool_size, "waiting": waiters}
+                for address, (checked_out, waiters) in usage.items()
+            },
+        }
+
+    import database
+    if database.async_read_engine is database.async_engine:
+        size = database.SQLITE_POOL_SIZE + database.SQLITE_MAX_OVERFLOW
+    else:
+        size = database.SQLITE_READ_POOL_SIZE
+    in_use = database.async_read_engine.pool.checkedout()
+    return {"ok": in_use / max(1, size) < HEALTH_MAX_POOL_USAGE, "in_use": in_use, "size": size}
+
+
+class HealthMonitor:
+
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL, stale_after: float = HEALTH_STALE_AFTER):
+        self.interval       = interval
+        self.stale_after    = stale_after
+        self.ready          = False
+        self.draining       = False
+        self.checked_at     : Optional[float] = None
+        self.checks         : dict = {}
+        self._task          : Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Run the first refresh, then keep refreshing in the background."""
+        self.draining = False
+        await self.refresh(loop_lag=0.0)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Fail readiness from now on and stop refreshing."""
+        self.draining = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self, loop_lag: float):
+        try:
+            # The pool is sampled before the ping, which holds a connection itself
+            checks = {"pool": check_pool()}
+            checks["database"] = await check_database()
+            checks["event_loop"] = {
+                "ok"        : loop_lag * 1000 < HEALTH_MAX_LOOP_LAG_MS,
+                "lag_ms"    : round(loop_lag * 1000, 2),
+            }
+        except Exception as exc:
+            # A broken check fails readiness instead of ending the refreshes
+            checks = {"refresh": {"ok": False, "error": repr(exc)}}
+        self._publish(all(check["ok"] for check in checks.values()), checks)
+
+    def _publish(self, ready: bool, checks: dict):
+        self.ready = ready
+        self.checks = checks
+        self.checked_at = time.monotonic()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            await self.refresh(loop_lag=max(0.0, loop.time() - due))
+
+    def _fresh(self) -> bool:
+        return self.checked_at is not None and time.monotonic() - self.checked_at <= self.stale_after
+
+    def liveness(self) -> tuple[int, bytes]:
+        if self.draining or self._fresh():
+            return 200, LIVE_BODY
+        return 503, STALLED_BODY
+
+    def readiness(self) -> tuple[int, bytes]:
+        if self.draining:
+            return 503, DRAINING_BODY
+        if self.checked_at is None:
+            return 503, STARTING_BODY
+        if not self._fresh():
+            return 503, STALE_BODY
+        return (200, READY_BODY) if self.ready else (503, NOT_READY_BODY)
+
+    def details(self) -> dict:
+        """The last published checks, for authenticated callers."""
+        return {
+            "ready"         : self.ready and not self.draining and self._fresh(),
+            "draining"      : self.draining,
+            "age_s"         : None if self.checked_at is None else round(time.monotonic() - self.checked_at, 3),
+            "checks"        : self.checks,
+        }
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,47 @@
+"""
+Index specification shared by the SQLite models (models.py) and the Mongo
+collections (models_mongo.py).
+
+Every repository query is served by one of these indexes;
+`python -m benchmarks.query_plans` checks that against the query planner of
+either backend. Field "id" is the primary key ("_id" in Mongo), which both
+backends index on their own.
+"""
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    table   : str
+    fields  : tuple[str, ...]
+    unique  : bool = False
+
+    @property
+    def name(self) -> str:
+        """SQLite index name (SQLAlchemy's ix_<table>_<column> convention)."""
+        return f"ix_{self.table}_{'_'.join(self.fields)}"
+
+    @property
+    def mongo_keys(self) -> list[tuple[str, int]]:
+        return [("_id" if field == "id" else field, 1) for field in self.fields]
+
+
+INDEXES = (
+    # Login and registration lookups; also enforce uniqueness
+    IndexSpec("users",          ("username",),                          unique=True),
+    IndexSpec("users",          ("email",),                             unique=True),
+    # API-key authentication; deactivate filters on (client_id, created_by),
+    # which this unique index already narrows to one row
+    IndexSpec("api_clients",    ("client_id",),                         unique=True),
+    # Keyset pages of one user's clients, in (created_at, id) order
+    IndexSpec("api_clients",    ("created_by", "created_at", "id")),
+)
+
+# SQLite indexes of earlier schemas that no query uses; create_schema drops
+# them from existing databases. users.role was unique, which also allowed
+# only one user per role; the id indexes duplicate the primary key.
+RETIRED_INDEXES = ("ix_users_role", "ix_users_id", "ix_api_clients_id")
+
+
+def indexes_for(table: str) -> tuple[IndexSpec, ...]:
+    return tuple(spec for spec in INDEXES if spec.table == table)
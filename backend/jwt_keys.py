@@ -0,0 +1,116 @@
+"""
+JWT signing / verification keys.
+
+With an HMAC algorithm (HS256, the default) the shared JWT_SECRET_KEY is used
+and no key id is emitted. With an asymmetric algorithm (ES256/ES384/ES512,
+RS256/...) every `<kid>.pem` file in JWT_KEYS_DIR is loaded once at startup:
+
+- private keys can sign and verify, public-only keys can only verify
+  (useful for keys that are being retired),
+- JWT_SIGNING_KID picks the signing key; by default the last private key
+  in sort order is used, so date-prefixed kids rotate naturally,
+- all public keys are published as a JWK Set on /.well-known/jwks.json.
+
+Generate a new key with:
+
+    python -m jwt_keys generate <kid> [algorithm]
+"""
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+from jose import jwk, JWTError
+from jose.backends.base import Key
+
+JWT_KEYS_DIR    = os.getenv("JWT_KEYS_DIR", "./jwt_keys")
+JWT_SIGNING_KID = os.getenv("JWT_SIGNING_KID", "")
+
+
+class KeyRing:
+    """Pre-constructed signing key plus a kid -> verification key map."""
+
+    def __init__(
+        self,
+        algorithm: str,
+        signing_key: Key,
+        signing_kid: Optional[str],
+        verification_keys: dict[Optional[str], Key],
+        public_jwks: list[dict],
+    ):
+        self.algorithm          = algorithm
+        self.signing_key        = signing_key
+        self.signing_kid        = signing_kid
+        self.verification_keys  = verification_keys
+        self.headers            = {"kid": signing_kid} if signing_kid else None
+        self.jwks               = {"keys": public_jwks}
+
+    @classmethod
+    def load(cls, algorithm: str, secret: str, keys_dir: str = JWT_KEYS_DIR, signing_kid: str = JWT_SIGNING_KID) -> "KeyRing":
+        if algorithm.startswith("HS"):
+            key = jwk.construct(secret, algorithm)
+            return cls(algorithm, key, None, {None: key}, [])
+
+        private_keys: dict[str, Key] = {}
+        verification_keys: dict[Optional[str], Key] = {}
+        public_jwks: list[dict] = []
+
+        for path in sorted(Path(keys_dir).glob("*.pem")):
+            kid = path.stem
+            key = jwk.construct(path.read_text(), algorithm)
+            if key.is_public():
+                public_key = key
+            else:
+                public_key = key.public_key()
+                private_keys[kid] = key
+            verification_keys[kid] = public_key
+            public_jwks.append({**public_key.to_dict(), "kid": kid, "use": "sig"})
+
+        if not private_keys:
+            raise RuntimeError(f"No private {algorithm} keys found in {keys_dir!r}")
+
+        kid = signing_kid or list(private_keys)[-1]
+        if kid not in private_keys:
+            raise RuntimeError(f"Signing key {kid!r} not found in {keys_dir!r}")
+
+        return cls(algorithm, private_keys[kid], kid, verification_keys, public_jwks)
+
+    def verification_key(self, kid: Optional[str]) -> Key:
+        key = self.verification_keys.get(kid)
+        if key is None:
+            raise JWTError("Unknown key id")
+        return key
+
+
+def generate_key(algorithm: str, kid: str, keys_dir: str = JWT_KEYS_DIR) -> Path:
+    """Write a new private key `<kid>.pem` for `algorithm` into `keys_dir`."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    curves = {"ES256": ec.SECP256R1, "ES384": ec.SECP384R1, "ES512": ec.SECP521R1}
+    if algorithm in curves:
+        private_key = ec.generate_private_key(curves[algorithm]())
+    elif algorithm.startswith("RS"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        raise ValueError(f"Cannot generate keys for {algorithm}")
+
+    path = Path(keys_dir) / f"{kid}.pem"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ))
+    path.chmod(0o600)
+    return path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != "generate":
+        sys.exit("usage: python -m jwt_keys generate <kid> [algorithm]")
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    algorithm = sys.argv[3] if len(sys.argv) == 4 else os.getenv("JWT_ALGORITHM", "ES256")
+    print(generate_key(algorithm, sys.argv[2], os.getenv("JWT_KEYS_DIR", JWT_KEYS_DIR)))
@@ -1,48 +1,73 @@
+import time
 from contextlib import asynccontextmanager
-from datetime import timedelta, datetime, timezone
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from datetime import timedelta
+from dataclasses import asdict
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-import bcrypt
-import uvicorn
 
 from dotenv import load_dotenv
 load_dotenv()
 
 from config import DATABASE_TYPE
-from database import engine, get_db, Base
-from models import User, APIClient
 from schemas import (
     EncryptedRequest, UserResponse, LoginResponse,
-    APIClientCreate, APIClientResponse, APIClientCreateResponse,
-    APIClientListResponse, UserDetailsResponse, ToggleRoleResponse
+    APIClientCreate, APIClientCreateResponse,
+    APIClientListResponse, UserDetailsResponse, ToggleRoleResponse,
+    ProfilingWindowRequest
 )
 from crypto_utils import decrypt_payload
 from auth import (
     create_access_token, get_current_user, get_current_user_or_api_client,
-    generate_client_credentials, hash_client_secret,
-    TokenData, APIClientData, JWT_ACCESS_TOKEN_EXPIRE_MINUTES
+    generate_client_credentials, hash_client_secret, require_admin,
+    evict_api_client, api_client_cache, token_cache, key_ring,
+    TokenData, APIClientData, JWT_ACCESS_TOKEN_EXPIRE_MINUTES, JWKS_MAX_AGE, API_CLIENT_CACHE_TTL
+)
+from rate_limiter import limiter, rate_limit_exceeded_handler, principal_rate_limit
+from password_hasher import password_hasher
+from repositories import user_repository, api_client_repository, DuplicateError, DUPLICATE_FIELD_MESSAGES
+from revocation import revocation_list
+from shm_storage import StorageFull
+from user_profiles import profile_cache, make_etag, etag_matches
+from fast_json import trusted, dumps
+import metrics
+from profiler import profiler, ProfilingMiddleware
+from health import health_monitor
+from pagination import (
+    encode_cursor, decode_cursor, API_CLIENTS_PAGE_SIZE, API_CLIENTS_MAX_PAGE_SIZE
 )
-from rate_limiter import limiter, rate_limit_exceeded_handler
 
 if DATABASE_TYPE == "mongo":
-    from database_mongo import connect_to_mongo, close_mongo_connection, get_database
+    from database_mongo import connect_to_mongo, close_mongo_connection, get_database, warm_up
     from models_mongo import UserCollection, APIClientCollection
+else:
+    import database
+    import models  # noqa: F401  (registers tables on Base.metadata)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     if DATABASE_TYPE == "sqlite":
-        Base.metadata.create_all(bind=engine)
+        database.init_engines()
+        async with database.async_engine.begin() as conn:
+            await conn.run_sync(database.create_schema)
     elif DATABASE_TYPE == "mongo":
         await connect_to_mongo()
         db = get_database()
         await UserCollection.create_indexes(db)
         await APIClientCollection.create_indexes(db)
+        await warm_up()
+        await UserCollection.warm_up(db)
+        await APIClientCollection.warm_up(db)
+    await health_monitor.start()
     yield
-    if DATABASE_TYPE == "mongo":
+    await health_monitor.stop()
+    password_hasher.shutdown()
+    if DATABASE_TYPE == "sqlite":
+        await database.dispose_engines()
+    elif DATABASE_TYPE == "mongo":
         await close_mongo_connection()
 
 app = FastAPI(lifespan=lifespan)
@@ -58,15 +83,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ProfilingMiddleware)
+
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(
-        plain_password.encode("utf-8"), hashed_password.encode("utf-8")
-    )
 
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
 
-def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+def _user_dict(user, role: str | None = None) -> dict:
+    """UserResponse fields of a UserRecord."""
+    return {
+        "id"        : user.id,
+        "username"  : user.username,
+        "email"     : user.email,
+        "role"      : role or user.role,
+    }
+
+
+def _api_client_dict(client) -> dict:
+    """APIClientResponse fields of an APIClientRecord."""
+    return {
+        "id"        : client.id,
+        "name"      : client.name,
+        "client_id" : client.client_id,
+        "is_active" : client.is_active,
+        "created_at": client.created_at,
+    }
 
 
 # ============================================================================
@@ -74,7 +123,7 @@ def get_password_hash(password: str) -> str:
 # ============================================================================
 
 @app.post("/auth/register", response_model=UserResponse)
-async def register(request: EncryptedRequest, db: Session = Depends(get_db)):
+async def register(request: EncryptedRequest):
     """Register a new user account."""
     try:
         data        = decrypt_payload(request.encrypted)
@@ -94,72 +143,30 @@ async def register(request: EncryptedRequest, db: Session = Depends(get_db)):
             detail="Password too long (max 72 bytes)",
         )
 
-    if DATABASE_TYPE == "mongo":
-        mongo_db = get_database()
-
-        if await UserCollection.find_by_username(mongo_db, username):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already registered",
-            )
-
-        if await UserCollection.find_by_email(mongo_db, email):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered",
-            )
-
-        hashed_password = get_password_hash(password)
-        user_data = {
-            "username"          : username,
-            "email"             : email,
-            "role"              : role,
-            "hashed_password"   : hashed_password,
-        }
-        created_user = await UserCollection.create(mongo_db, user_data)
-        return UserResponse(
-            id=str(created_user["_id"]),
-            username    =created_user["username"],
-            email       =created_user["email"],
-            role        =created_user["role"],
+    # No existence pre-checks: the unique indexes on username and email
+    # reject duplicates in the insert itself, which also closes the race
+    # between two concurrent registrations.
+    hashed_password = await get_password_hash(password)
+    try:
+        user = await user_repository.create(
+            username        =username,
+            email           =email,
+            role            =role,
+            hashed_password =hashed_password,
         )
-
-    db_user = db.query(User).filter(User.username == username).first()
-    if db_user:
+    except DuplicateError as exc:
+        # Any other unique index (or one the driver could not name) still
+        # means the user conflicts with an existing one, not a server error
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered",
+            detail=DUPLICATE_FIELD_MESSAGES.get(exc.field, "Duplicate user"),
         )
 
-    db_user = db.query(User).filter(User.email == email).first()
-    if db_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered",
-        )
-
-    hashed_password = get_password_hash(password)
-    print(role)
-    db_user = User(
-        username        =username,
-        email           =email,
-        role            =role,
-        hashed_password =hashed_password,
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    return UserResponse(
-        id=str(db_user.id),
-        username=db_user.username,
-        email=db_user.email,
-        role=db_user.role,
-    )
+    return trusted(UserResponse, _user_dict(user))
 
 
 @app.post("/auth/login", response_model=LoginResponse)
-async def login(request: EncryptedRequest, db: Session = Depends(get_db)):
+async def login(request: EncryptedRequest):
     """
     Login and receive a JWT token.
 
@@ -176,85 +183,81 @@ async def login(request: EncryptedRequest, db: Session = Depends(get_db)):
             detail="Invalid encrypted data",
         )
 
-    if DATABASE_TYPE == "mongo":
-        mongo_db = get_database()
-        db_user = await UserCollection.find_by_username(mongo_db, username)
-
-        if not db_user or not verify_password(password, db_user["hashed_password"]):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid username or password",
-            )
-
-        # Create JWT token
-        access_token = create_access_token(
-            data={
-                "user_id"       : str(db_user["_id"]),
-                "username"      : db_user["username"],
-                "role"          : db_user["role"],
-                "token_type"    : "user",
-            },
-            expires_delta=timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES),
-        )
-
-        return LoginResponse(
-            access_token=access_token,
-            token_type="bearer",
-            expires_in=JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-            user=UserResponse(
-                id=str(db_user["_id"]),
-                username=db_user["username"],
-                email=db_user["email"],
-                role=db_user["role"]
-            ),
-        )
-
-
-    db_user = db.query(User).filter(User.username == username).first()
+    user = await user_repository.find_by_username(username)
 
-    if not db_user or not verify_password(password, db_user.hashed_password):
+    if not user or not await verify_password(password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
         )
 
-
     access_token = create_access_token(
         data={
-            "user_id": str(db_user.id),
-            "username": db_user.username,
-            "role": db_user.role,
+            "user_id": user.id,
+            "username": user.username,
+            "role": user.role,
             "token_type": "user",
         },
         expires_delta=timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES),
     )
 
-    return LoginResponse(
-         
-        access_token=access_token,
-        token_type="bearer",
-        expires_in=JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        user=UserResponse(
-            id=str(db_user.id),
-            username=db_user.username,
-            email=db_user.email,
-            role=db_user.role
-        ),
+    return trusted(LoginResponse, {
+        "access_token"  : access_token,
+        "token_type"    : "bearer",
+        "expires_in"    : JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "user"          : _user_dict(user),
+    })
+
+
+@app.get("/.well-known/jwks.json")
+async def jwks():
+    """
+    Public keys for verifying access tokens locally (JWK Set, RFC 7517).
+
+    Empty when tokens are signed with a shared HMAC secret.
+    """
+    return JSONResponse(
+        key_ring.jwks,
+        headers={"Cache-Control": f"public, max-age={JWKS_MAX_AGE}"},
     )
 
 
+@app.get("/livez", include_in_schema=False)
+async def livez():
+    """Liveness probe: fails only when the background health checks have stalled."""
+    status_code, body = health_monitor.liveness()
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """
+    Readiness probe: the status the background health checks last published
+    (database ping, pool saturation, event-loop lag). See health.py; the
+    results of each check are in /admin/stats.
+    """
+    status_code, body = health_monitor.readiness()
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+if metrics.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        """Prometheus scrape endpoint (this worker's metrics only)."""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # ============================================================================
 # Protected Endpoints (JWT or API Key Authentication Required)
 # ============================================================================
 
-@app.get("/health")
-@limiter.limit("60/minute")
+@app.get("/health", dependencies=[Depends(principal_rate_limit())])
 async def health_check(
-    request: Request,
     auth: TokenData | APIClientData = Depends(get_current_user_or_api_client)
 ):
     """
-    Health check endpoint - requires authentication.
+    Health check endpoint - requires authentication. Orchestrator probes
+    should use /livez and /readyz instead.
 
     Accepts either:
     - JWT Bearer token (for logged-in users)
@@ -267,12 +270,14 @@ async def health_check(
     }
 
 
-@app.get("/get_user_details", response_model=UserDetailsResponse)
-@limiter.limit("60/minute")
+@app.get(
+    "/get_user_details",
+    response_model=UserDetailsResponse,
+    dependencies=[Depends(principal_rate_limit())],
+)
 async def get_user_details(
-    request: Request,
     auth: TokenData | APIClientData = Depends(get_current_user_or_api_client),
-    db: Session = Depends(get_db),
+    if_none_match: str | None = Header(None),
 ):
     """
     Get details of the authenticated user or API client.
@@ -280,54 +285,54 @@ async def get_user_details(
     Accepts either:
     - JWT Bearer token (for logged-in users)
     - API credentials (X-API-Key and X-API-Secret headers for external clients)
+
+    Responses carry a strong ETag. A request whose If-None-Match matches it
+    gets 304; for users whose profile is cached that needs no database read
+    and no serialization.
     """
     if isinstance(auth, TokenData):
- 
-        if DATABASE_TYPE == "mongo":
-            mongo_db = get_database()
-            user = await UserCollection.find_by_id(mongo_db, auth.user_id)
+        cached = profile_cache.get(auth.user_id)
+        if cached is None:
+            user = await user_repository.find_by_id(auth.user_id)
             if not user:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="User not found",
                 )
-            return UserDetailsResponse(
-                id=str(user["_id"]),
-                username=user["username"],
-                email=user["email"],
-                role=user["role"],
-                auth_type="user",
-            )
-        else:
-            user = db.query(User).filter(User.id == int(auth.user_id)).first()
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="User not found",
-                )
-            return UserDetailsResponse(
-                id=str(user.id),
+            body = UserDetailsResponse(
+                id=user.id,
                 username=user.username,
                 email=user.email,
                 role=user.role,
                 auth_type="user",
-            )
+            ).model_dump_json().encode("utf-8")
+            cached = (make_etag(body), body)
+            profile_cache.set(auth.user_id, cached)
+        etag, body = cached
     else:
-        return UserDetailsResponse(
+        body = UserDetailsResponse(
             id=auth.client_id,
             username=auth.client_name,
             email="",
             auth_type="api_client",
             client_name=auth.client_name,
-        )
+        ).model_dump_json().encode("utf-8")
+        etag = make_etag(body)
+
+    # private: the body depends on the caller; no-cache: revalidate every time
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
-@app.put("/user/toggle-role", response_model=ToggleRoleResponse)
-@limiter.limit("10/minute")
+@app.put(
+    "/user/toggle-role",
+    response_model=ToggleRoleResponse,
+    dependencies=[Depends(principal_rate_limit(get_current_user, "10/minute"))],
+)
 async def toggle_role(
-    request: Request,
     current_user: TokenData = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
     Toggle the current user's role between 'admin' and 'guest'.
@@ -337,74 +342,44 @@ async def toggle_role(
     """
     new_role = "guest" if current_user.role == "admin" else "admin"
 
-    if DATABASE_TYPE == "mongo":
-        mongo_db = get_database()
-        updated_user = await UserCollection.update_role(mongo_db, current_user.user_id, new_role)
-
-        if not updated_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found",
-            )
-
-        access_token = create_access_token(
-            data={
-                "user_id": str(updated_user["_id"]),
-                "username": updated_user["username"],
-                "role": new_role,
-                "token_type": "user",
-            },
-            expires_delta=timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES),
+    # Every token issued so far carries the previous role. They are all
+    # revoked first, so the role never changes while one of them stays valid
+    # on some worker; none outlives a full token lifetime from now.
+    try:
+        revocation_list.revoke_user_tokens(
+            current_user.user_id, time.time() + JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60
         )
-
-        return ToggleRoleResponse(
-            access_token=access_token,
-            token_type="bearer",
-            expires_in=JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-            user=UserResponse(
-                id=str(updated_user["_id"]),
-                username=updated_user["username"],
-                email=updated_user["email"],
-                role=new_role,
-            ),
-            message=f"Role changed from '{current_user.role}' to '{new_role}'",
+    except StorageFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Token revocation unavailable, please retry",
         )
 
-    # SQLite path
-    db_user = db.query(User).filter(User.id == int(current_user.user_id)).first()
+    user = await user_repository.update_role(current_user.user_id, new_role)
 
-    if not db_user:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
 
-    db_user.role = new_role
-    db.commit()
-    db.refresh(db_user)
-
     access_token = create_access_token(
         data={
-            "user_id": str(db_user.id),
-            "username": db_user.username,
+            "user_id": user.id,
+            "username": user.username,
             "role": new_role,
             "token_type": "user",
         },
         expires_delta=timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES),
     )
 
-    return ToggleRoleResponse(
-        access_token=access_token,
-        token_type="bearer",
-        expires_in=JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        user=UserResponse(
-            id=str(db_user.id),
-            username=db_user.username,
-            email=db_user.email,
-            role=new_role,
-        ),
-        message=f"Role changed from '{current_user.role}' to '{new_role}'",
-    )
+    return trusted(ToggleRoleResponse, {
+        "access_token"  : access_token,
+        "token_type"    : "bearer",
+        "expires_in"    : JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "user"          : _user_dict(user, role=new_role),
+        "message"       : f"Role changed from '{current_user.role}' to '{new_role}'",
+    })
 
 
 # ============================================================================
@@ -415,7 +390,6 @@ async def toggle_role(
 async def create_api_client(
     client_data: APIClientCreate,
     current_user: TokenData = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
     Create a new API client for external access.
@@ -426,131 +400,174 @@ async def create_api_client(
     Requires JWT authentication.
     """
     client_id, client_secret = generate_client_credentials()
-    hashed_secret = hash_client_secret(client_secret)
-
-    if DATABASE_TYPE == "mongo":
-        mongo_db = get_database()
-        client_doc = {
-            "name"              : client_data.name,
-            "client_id"         : client_id,
-            "hashed_secret"     : hashed_secret,
-            "created_by"        : current_user.user_id,
-            "is_active"         : True,
-            "created_at"        : datetime.now(timezone.utc),
-        }
-        created_client = await APIClientCollection.create(mongo_db, client_doc)
-        return APIClientCreateResponse(
-            id=str(created_client["_id"]),
-            name=created_client["name"],
-            client_id=created_client["client_id"],
-            client_secret=client_secret,
-            is_active=True,
-            created_at=created_client["created_at"],
-        )
+    hashed_secret = await hash_client_secret(client_secret)
 
-    # SQLite path
-    db_client = APIClient(
-        name=client_data.name,
-        client_id=client_id,
-        hashed_secret=hashed_secret,
-        created_by=int(current_user.user_id),
-        is_active=True,
-    )
-    db.add(db_client)
-    db.commit()
-    db.refresh(db_client)
-
-    return APIClientCreateResponse(
-        id=str(db_client.id),
-        name=db_client.name,
-        client_id=db_client.client_id,
-        client_secret=client_secret,
-        is_active=db_client.is_active,
-        created_at=db_client.created_at,
+    client = await api_client_repository.create(
+        name            =client_data.name,
+        client_id       =client_id,
+        hashed_secret   =hashed_secret,
+        created_by      =current_user.user_id,
     )
 
+    return trusted(APIClientCreateResponse, {
+        "id"            : client.id,
+        "name"          : client.name,
+        "client_id"     : client.client_id,
+        "client_secret" : client_secret,
+        "is_active"     : client.is_active,
+        "created_at"    : client.created_at,
+        "message"       : APIClientCreateResponse.model_fields["message"].default,
+    })
+
+async def _stream_api_clients(user_id: str):
+    """Every client of a user as NDJSON, fetched one keyset page at a time."""
+    after = None
+    while True:
+        page = await api_client_repository.find_page_by_user(user_id, API_CLIENTS_MAX_PAGE_SIZE, after)
+        for c in page:
+            yield dumps(_api_client_dict(c)) + "\n"
+        if len(page) < API_CLIENTS_MAX_PAGE_SIZE:
+            return
+        after = (page[-1].created_at, page[-1].id)
+
+
 @app.get("/api-clients", response_model=APIClientListResponse)
 async def list_api_clients(
+    limit: int = Query(API_CLIENTS_PAGE_SIZE, ge=1, le=API_CLIENTS_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     current_user: TokenData = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
-    List all API clients created by the current user.
+    List the API clients created by the current user, oldest first.
+
+    Returns `limit` clients per page; pass `next_cursor` back as `cursor` to
+    get the next page. With `format=ndjson` the full list is streamed
+    instead, one client per line (`limit` and `cursor` are ignored).
 
     Requires JWT authentication.
     """
-    if DATABASE_TYPE == "mongo":
-        mongo_db = get_database()
-        clients = await APIClientCollection.find_by_user(mongo_db, current_user.user_id)
-        return APIClientListResponse(
-            clients=[
-                APIClientResponse(
-                    id=str(c["_id"]),
-                    name=c["name"],
-                    client_id=c["client_id"],
-                    is_active=c.get("is_active", True),
-                    created_at=c["created_at"],
-                )
-                for c in clients
-            ]
+    if format == "ndjson":
+        return StreamingResponse(
+            _stream_api_clients(current_user.user_id), media_type="application/x-ndjson"
         )
 
-    clients = db.query(APIClient).filter(
-        APIClient.created_by == int(current_user.user_id)
-    ).all()
-
-    return APIClientListResponse(
-        clients=[
-            APIClientResponse(
-                id=str(c.id),
-                name=c.name,
-                client_id=c.client_id,
-                is_active=c.is_active,
-                created_at=c.created_at,
-            )
-            for c in clients
-        ]
-    )
+    try:
+        after = decode_cursor(cursor) if cursor else None
+        # One extra row tells whether there is a next page
+        clients = await api_client_repository.find_page_by_user(current_user.user_id, limit + 1, after)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+    next_cursor = None
+    if len(clients) > limit:
+        clients = clients[:limit]
+        next_cursor = encode_cursor(clients[-1].created_at, clients[-1].id)
+
+    return trusted(APIClientListResponse, {
+        "clients"       : [_api_client_dict(c) for c in clients],
+        "next_cursor"   : next_cursor,
+    })
 
 @app.delete("/api-clients/{client_id}")
 async def revoke_api_client(
     client_id: str,
     current_user: TokenData = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
     Revoke (deactivate) an API client.
 
     Requires JWT authentication. Users can only revoke their own clients.
     """
-    if DATABASE_TYPE == "mongo":
-        mongo_db = get_database()
-        success = await APIClientCollection.deactivate(
-            mongo_db, client_id, current_user.user_id
-        )
-        if not success:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="API client not found or already revoked",
-            )
-        return {"message": "API client revoked successfully"}
-
-    # SQLite path
-    db_client = db.query(APIClient).filter(
-        APIClient.client_id == client_id,
-        APIClient.created_by == int(current_user.user_id),
-    ).first()
-
-    if not db_client:
+    success = await api_client_repository.deactivate(client_id, current_user.user_id)
+
+    if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="API client not found",
+            detail="API client not found or already revoked",
         )
 
-    db_client.is_active = False
-    db.commit()
+    try:
+        evict_api_client(client_id)
+    except StorageFull:
+        # Deactivated in the database; other workers' credential caches
+        # may still accept it until their entries expire
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"API client deactivated, but other workers may accept it for up to {API_CLIENT_CACHE_TTL}s",
+        )
 
     return {"message": "API client revoked successfully"}
 
+# ============================================================================
+# Admin Endpoints (JWT Authentication with admin role Required)
+# ============================================================================
+
+@app.get("/admin/stats")
+async def admin_stats(current_user: TokenData = Depends(require_admin)):
+    """
+    Runtime statistics for the backend's internal subsystems.
+
+    Requires JWT authentication with the 'admin' role.
+    """
+    return {
+        "password_hashing": {
+            **password_hasher.stats.snapshot(),
+            "pending"   : password_hasher.pending,
+            "workers"   : password_hasher.workers,
+            "max_queue" : password_hasher.max_queue,
+        },
+        "api_client_cache": api_client_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "user_profile_cache": profile_cache.stats(),
+        "revocation": revocation_list.stats(),
+        "health": health_monitor.details(),
+    }
+
+
+@app.post("/admin/users/import")
+async def import_users(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    current_user: TokenData = Depends(require_admin),
+):
+    """
+    Bulk-create users from a streamed CSV (header: username,email,password[,role])
+    or NDJSON request body. Duplicate and invalid rows are reported per line
+    without aborting the import. For very large files prefer `python -m bulk_import`.
+
+    Requires JWT authentication with the 'admin' role.
+    """
+    from bulk_import import BulkImporter, iter_lines  # admin-only; kept out of startup
+
+    report = await BulkImporter().run(iter_lines(request.stream()), format)
+    return asdict(report)
+
+
+@app.get("/admin/profiling")
+async def profiling_status(current_user: TokenData = Depends(require_admin)):
+    """Current request-profiling settings of this worker."""
+    return profiler.status()
+
+
+@app.post("/admin/profiling")
+async def start_profiling(
+    window: ProfilingWindowRequest,
+    current_user: TokenData = Depends(require_admin),
+):
+    """
+    Profile `sample_rate` of this worker's requests for the next `seconds`.
+
+    Collapsed-stack files are written to PROFILE_DIR. Requires JWT
+    authentication with the 'admin' role.
+    """
+    profiler.enable_window(window.seconds, window.sample_rate)
+    return profiler.status()
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import serve
+    raise SystemExit(serve.main(app=app))
@@ -0,0 +1,324 @@
+"""
+Request and phase metrics, exposed on /metrics in the Prometheus text format.
+
+Deliberately small: counters, gauges and fixed-bucket histograms keyed by a
+tuple of label values, rendered on scrape. Updates take no lock, so they
+must come from the event loop thread; the Mongo command listener, which
+runs on driver threads, serializes its own updates. Values are per worker
+process, so scrape each worker or run a single one per target.
+
+    METRICS_ENABLED=false   turns off the middleware, /metrics and every
+                            phase timer (observe() returns immediately).
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Iterable
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Seconds; spans sub-millisecond cache hits up to bcrypt under load
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name           = name
+        self.documentation  = documentation
+        self.labelnames     = tuple(labelnames)
+        registry.append(self)
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        if not METRICS_ENABLED:
+            return
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def label_sets(self) -> list[tuple]:
+        """Label values of every series recorded so far."""
+        return list(self._values)
+
+    def render(self) -> list[str]:
+        values = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+            for labels, v in values
+        ]
+
+
+class Gauge(Counter):
+    """Gauge set directly, or read from `function` at scrape time."""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+    def render(self) -> list[str]:
+        if self.function is not None:
+            self._values[()] = self.function()
+        return super().render()
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket..., count above last bucket, sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        if not METRICS_ENABLED:
+            return
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        snapshot = [(labels, list(series)) for labels, series in list(self._series.items())]
+
+        lines = self._header()
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+registry: list[_Metric] = []
+
+
+def render() -> str:
+    return "\n".join(line for metric in registry for line in metric.render()) + "\n"
+
+
+# ============================================================================
+# Application metrics
+# ============================================================================
+
+# Request counts are REQUEST_DURATION's `_count` series
+REQUEST_DURATION    = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status")
+)
+PHASE_DURATION      = Histogram(
+    "phase_duration_seconds",
+    "Time spent in one phase of request handling "
+    "(decrypt, password_hash, password_verify, jwt_encode, jwt_decode, rate_limit).",
+    ("phase",),
+)
+DB_QUERY_DURATION   = Histogram(
+    "db_query_duration_seconds", "Database round trips, by backend and operation.", ("backend", "operation")
+)
+RATE_LIMITED        = Counter("rate_limit_rejections_total", "Requests rejected by a rate limiter.", ("limiter",))
+
+_in_flight          = 0
+IN_FLIGHT           = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled.", function=lambda: _in_flight
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording count, latency and in-flight requests.
+
+    The route label is the matched route template (e.g. /api-clients/{client_id}),
+    or "unmatched", so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        _in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _in_flight -= 1
+            route = scope.get("route")
+            REQUEST_DURATION.observe(
+                elapsed, scope["method"], route.path if route is not None else "unmatched", str(status_code)
+            )
+
+
+def instrument_sqlalchemy(engine):
+    """Time every statement run through `engine` (sync or the sync_engine of an async one)."""
+    from sqlalchemy import event
+
+    # The start time lives on the statement's execution context, so a
+    # statement that raises (no after_cursor_execute) leaves nothing behind
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = context._query_started
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else "UNKNOWN"
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, "sqlite", operation)
+
+
+# Mongo driver listeners run on driver threads and share this lock
+_mongo_lock         = threading.Lock()
+
+MONGO_POOL_CONNECTIONS  = Gauge("mongo_pool_connections", "Open connections in the MongoDB pool.", ("address",))
+MONGO_POOL_CHECKED_OUT  = Gauge("mongo_pool_checked_out", "MongoDB connections currently in use.", ("address",))
+MONGO_POOL_WAITERS      = Gauge("mongo_pool_waiters", "Operations waiting to check out a MongoDB connection.", ("address",))
+MONGO_POOL_WAIT         = Histogram(
+    "mongo_pool_wait_seconds", "Time to check out a MongoDB connection (including creating it).", ("address",)
+)
+MONGO_POOL_CHECKOUT_FAILED = Counter(
+    "mongo_pool_checkout_failures_total", "Failed MongoDB connection checkouts, by reason.", ("address", "reason")
+)
+
+
+def _address_label(address) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+def mongo_pool_listener():
+    """pymongo ConnectionPoolListener feeding the mongo_pool_* metrics."""
+    from pymongo import monitoring
+
+    def adjust(gauge: Gauge, event, delta: int):
+        with _mongo_lock:
+            gauge.inc(_address_label(event.address), amount=delta)
+
+    class PoolMonitor(monitoring.ConnectionPoolListener):
+        def pool_created(self, event):
+            pass
+
+        def pool_ready(self, event):
+            pass
+
+        def pool_cleared(self, event):
+            pass
+
+        def pool_closed(self, event):
+            pass
+
+        def connection_created(self, event):
+            adjust(MONGO_POOL_CONNECTIONS, event, 1)
+
+        def connection_ready(self, event):
+            pass
+
+        def connection_closed(self, event):
+            adjust(MONGO_POOL_CONNECTIONS, event, -1)
+
+        def connection_check_out_started(self, event):
+            adjust(MONGO_POOL_WAITERS, event, 1)
+
+        def connection_check_out_failed(self, event):
+            adjust(MONGO_POOL_WAITERS, event, -1)
+            with _mongo_lock:
+                MONGO_POOL_CHECKOUT_FAILED.inc(_address_label(event.address), str(event.reason))
+
+        def connection_checked_out(self, event):
+            adjust(MONGO_POOL_WAITERS, event, -1)
+            adjust(MONGO_POOL_CHECKED_OUT, event, 1)
+            if event.duration is not None:
+                with _mongo_lock:
+                    MONGO_POOL_WAIT.observe(event.duration, _address_label(event.address))
+
+        def connection_checked_in(self, event):
+            adjust(MONGO_POOL_CHECKED_OUT, event, -1)
+
+    return PoolMonitor()
+
+
+def mongo_pool_usage() -> dict[str, tuple[float, float]]:
+    """{address: (checked-out connections, waiting operations)} from the pool listener."""
+    with _mongo_lock:
+        return {
+            labels[0]: (MONGO_POOL_CHECKED_OUT.get(*labels), MONGO_POOL_WAITERS.get(*labels))
+            for labels in set(MONGO_POOL_CHECKED_OUT.label_sets()) | set(MONGO_POOL_WAITERS.label_sets())
+        }
+
+
+def mongo_command_listener():
+    """pymongo CommandListener recording every command's duration."""
+    from pymongo import monitoring
+
+    class CommandTimer(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            with _mongo_lock:
+                DB_QUERY_DURATION.observe(event.duration_micros / 1e6, "mongo", event.command_name)
+
+        def failed(self, event):
+            with _mongo_lock:
+                DB_QUERY_DURATION.observe(event.duration_micros / 1e6, "mongo", event.command_name)
+
+    return CommandTimer()
@@ -1,27 +1,37 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.sql import func
 from database import Base
+from indexes import indexes_for
+
+
+def _table_indexes(table: str) -> tuple[Index, ...]:
+    """SQLAlchemy indexes of a table's entries in indexes.INDEXES."""
+    return tuple(Index(spec.name, *spec.fields, unique=spec.unique) for spec in indexes_for(table))
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id              = Column(Integer, primary_key=True, index=True)
-    username        = Column(String, unique=True, index=True, nullable=False)
-    email           = Column(String, unique=True, index=True, nullable=False) 
-    role           = Column(String, unique=True, index=True, nullable=False) 
+    id              = Column(Integer, primary_key=True)
+    username        = Column(String, nullable=False)
+    email           = Column(String, nullable=False)
+    role            = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     created_at      = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = _table_indexes("users")
+
 
 class APIClient(Base):
     """API clients for external access with client_id/secret authentication."""
     __tablename__ = "api_clients"
 
-    id            = Column(Integer, primary_key=True, index=True)
+    id            = Column(Integer, primary_key=True)
     name          = Column(String, nullable=False)
-    client_id     = Column(String, unique=True, index=True, nullable=False)
+    client_id     = Column(String, nullable=False)
     hashed_secret = Column(String, nullable=False)
     created_by    = Column(Integer, ForeignKey("users.id"), nullable=False)
     is_active     = Column(Boolean, default=True, nullable=False)
     created_at    = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = _table_indexes("api_clients")
@@ -1,8 +1,36 @@
+import os
 from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 from bson import ObjectId
 
+from indexes import indexes_for
+
+# Index entries read per index by warm_up()
+MONGO_WARMUP_INDEX_ENTRIES  = int(os.getenv("MONGO_WARMUP_INDEX_ENTRIES", "100000"))
+
+
+async def _create_spec_indexes(collection):
+    """The collection's entries in indexes.INDEXES, under the driver's default names."""
+    for spec in indexes_for(collection.name):
+        await collection.create_index(spec.mongo_keys, unique=spec.unique)
+
+
+async def _warm_spec_indexes(collection, max_entries: int = MONGO_WARMUP_INDEX_ENTRIES):
+    """
+    Scan the first `max_entries` entries of each of the collection's indexes,
+    so those pages are in the server's cache. The projection only holds
+    index keys, so the scans are covered and never load documents.
+    """
+    for spec in indexes_for(collection.name):
+        keys = [key for key, _ in spec.mongo_keys]
+        projection = {key: 1 for key in keys}
+        if "_id" not in keys:
+            projection["_id"] = 0
+        cursor = collection.find({}, projection).hint(spec.mongo_keys).limit(max_entries).batch_size(10000)
+        async for _ in cursor:
+            pass
+
 
 class PyObjectId(ObjectId):
     @classmethod
@@ -40,14 +68,16 @@ class UserCollection:
 
     @classmethod
     async def create_indexes(cls, db):
-        collection = db[cls.collection_name]
-        await collection.create_index("username", unique=True)
-        await collection.create_index("email", unique=True)
+        await _create_spec_indexes(db[cls.collection_name])
 
     @classmethod
-    async def find_by_username(cls, db, username: str) -> Optional[dict]:
+    async def warm_up(cls, db):
+        await _warm_spec_indexes(db[cls.collection_name])
+
+    @classmethod
+    async def find_by_username(cls, db, username: str, projection: Optional[dict] = None) -> Optional[dict]:
         collection = db[cls.collection_name]
-        return await collection.find_one({"username": username})
+        return await collection.find_one({"username": username}, projection)
 
     @classmethod
     async def find_by_email(cls, db, email: str) -> Optional[dict]:
@@ -62,16 +92,23 @@ class UserCollection:
         return user_data
 
     @classmethod
-    async def find_by_id(cls, db, user_id: str) -> Optional[dict]:
+    async def create_many(cls, db, users: list[dict]):
+        """Unordered bulk insert: a duplicate only fails its own document."""
+        collection = db[cls.collection_name]
+        return await collection.insert_many(users, ordered=False)
+
+    @classmethod
+    async def find_by_id(cls, db, user_id: str, projection: Optional[dict] = None) -> Optional[dict]:
         collection = db[cls.collection_name]
-        return await collection.find_one({"_id": ObjectId(user_id)})
+        return await collection.find_one({"_id": ObjectId(user_id)}, projection)
 
     @classmethod
-    async def update_role(cls, db, user_id: str, new_role: str) -> Optional[dict]:
+    async def update_role(cls, db, user_id: str, new_role: str, projection: Optional[dict] = None) -> Optional[dict]:
         collection = db[cls.collection_name]
         result = await collection.find_one_and_update(
             {"_id": ObjectId(user_id)},
             {"$set": {"role": new_role}},
+            projection=projection,
             return_document=True
         )
         return result
@@ -100,19 +137,33 @@ class APIClientCollection:
 
     @classmethod
     async def create_indexes(cls, db):
-        collection = db[cls.collection_name]
-        await collection.create_index("client_id", unique=True)
+        await _create_spec_indexes(db[cls.collection_name])
+
+    @classmethod
+    async def warm_up(cls, db):
+        await _warm_spec_indexes(db[cls.collection_name])
 
     @classmethod
-    async def find_by_client_id(cls, db, client_id: str) -> Optional[dict]:
+    async def find_by_client_id(cls, db, client_id: str, projection: Optional[dict] = None) -> Optional[dict]:
         collection = db[cls.collection_name]
-        return await collection.find_one({"client_id": client_id, "is_active": True})
+        return await collection.find_one({"client_id": client_id, "is_active": True}, projection)
 
     @classmethod
-    async def find_by_user(cls, db, user_id: str) -> list[dict]:
+    async def find_page_by_user(
+        cls, db, user_id: str, limit: int, after: Optional[tuple[datetime, ObjectId]] = None,
+        projection: Optional[dict] = None,
+    ) -> list[dict]:
+        """Up to `limit` clients of a user in (created_at, _id) order, after the key `after`."""
         collection = db[cls.collection_name]
-        cursor = collection.find({"created_by": user_id})
-        return await cursor.to_list(length=100)
+        query = {"created_by": user_id}
+        if after is not None:
+            created_at, last_id = after
+            query["$or"] = [
+                {"created_at": {"$gt": created_at}},
+                {"created_at": created_at, "_id": {"$gt": last_id}},
+            ]
+        cursor = collection.find(query, projection).sort([("created_at", 1), ("_id", 1)]).limit(limit)
+        return await cursor.to_list(length=limit)
 
     @classmethod
     async def create(cls, db, client_data: dict) -> dict:
@@ -0,0 +1,30 @@
+"""
+Opaque keyset cursors.
+
+A cursor is the (created_at, id) key of the last row of a page, encoded as
+URL-safe base64 JSON. Clients pass it back unchanged to get the next page;
+its content is not part of the API.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+
+API_CLIENTS_PAGE_SIZE       = int(os.getenv("API_CLIENTS_PAGE_SIZE", "50"))
+API_CLIENTS_MAX_PAGE_SIZE   = int(os.getenv("API_CLIENTS_MAX_PAGE_SIZE", "200"))
+
+
+def encode_cursor(created_at: datetime, id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(id)
+    except (binascii.Error, TypeError, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
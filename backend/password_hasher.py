@@ -0,0 +1,149 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+from fastapi import HTTPException, status
+
+from metrics import PHASE_DURATION
+
+# "thread" (bcrypt releases the GIL) or "process"
+PASSWORD_HASH_EXECUTOR      = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS       = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_QUEUE     = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+PASSWORD_HASH_RETRY_AFTER   = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
+
+def _timed_hash(secret: bytes, submitted_at: float) -> tuple[bytes, float, float]:
+    started_at = time.monotonic()
+    hashed = bcrypt.hashpw(secret, bcrypt.gensalt())
+    return hashed, started_at - submitted_at, time.monotonic() - started_at
+
+
+def _timed_check(secret: bytes, hashed: bytes, submitted_at: float) -> tuple[bool, float, float]:
+    started_at = time.monotonic()
+    ok = bcrypt.checkpw(secret, hashed)
+    return ok, started_at - submitted_at, time.monotonic() - started_at
+
+
+class HashingStats:
+    """Counters and timings (in seconds) for the password hashing pool."""
+
+    def __init__(self):
+        self._lock              = threading.Lock()
+        self.completed          = 0
+        self.rejected           = 0
+        self.queue_wait_total   = 0.0
+        self.queue_wait_max     = 0.0
+        self.hash_time_total    = 0.0
+        self.hash_time_max      = 0.0
+
+    def record(self, queue_wait: float, hash_time: float):
+        with self._lock:
+            self.completed += 1
+            self.queue_wait_total += queue_wait
+            self.hash_time_total += hash_time
+            self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+            self.hash_time_max = max(self.hash_time_max, hash_time)
+
+    def record_rejection(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "completed"         : self.completed,
+                "rejected"          : self.rejected,
+                "queue_wait_avg_ms" : self.queue_wait_total / completed * 1000,
+                "queue_wait_max_ms" : self.queue_wait_max * 1000,
+                "hash_time_avg_ms"  : self.hash_time_total / completed * 1000,
+                "hash_time_max_ms"  : self.hash_time_max * 1000,
+            }
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded worker pool so it never blocks the event loop.
+
+    At most `workers + max_queue` operations may be pending at once; further
+    calls are rejected immediately with 503 and a Retry-After header.
+    """
+
+    def __init__(
+        self,
+        executor_type: str = PASSWORD_HASH_EXECUTOR,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+        retry_after: int = PASSWORD_HASH_RETRY_AFTER,
+    ):
+        self.executor_type  = executor_type
+        self.workers        = max(1, workers)
+        self.max_queue      = max(0, max_queue)
+        self.retry_after    = retry_after
+        self.stats          = HashingStats()
+        self._executor: Optional[Executor] = None
+        self._pending       = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                # forkserver: forking this process would copy the state of its
+                # other threads (database drivers, profiler) mid-operation
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hasher"
+                )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _submit(self, phase: str, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            self.stats.record_rejection()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, queue_wait, hash_time = await loop.run_in_executor(
+                self._get_executor(), fn, *args, time.monotonic()
+            )
+        finally:
+            self._pending -= 1
+            PHASE_DURATION.observe(time.perf_counter() - started, phase)
+
+        self.stats.record(queue_wait, hash_time)
+        return result
+
+    async def hash(self, secret: str) -> str:
+        hashed = await self._submit("password_hash", _timed_hash, secret.encode("utf-8"))
+        return hashed.decode("utf-8")
+
+    async def verify(self, secret: str, hashed: str) -> bool:
+        return await self._submit(
+            "password_verify", _timed_check, secret.encode("utf-8"), hashed.encode("utf-8")
+        )
+
+
+password_hasher = PasswordHasher()
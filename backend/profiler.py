@@ -0,0 +1,255 @@
+"""
+On-demand sampling profiler for live requests.
+
+A request is profiled when one of these holds:
+
+- it is picked by the sample rate: PROFILE_SAMPLE_RATE from the
+  environment, or the rate set for a time window through
+  POST /admin/profiling,
+- it carries `X-Profile: 1` together with an admin bearer token.
+
+While any profiled request is in flight, a daemon thread samples the event
+loop every PROFILE_INTERVAL_MS milliseconds. How a sample is attributed
+depends on the request's task:
+
+- if the task is running, the sample is the loop thread's stack;
+- if the task is suspended, it is the chain of awaiting coroutines, ending
+  in "[await <type>]". That is where bcrypt (run_in_executor) and database
+  time show up.
+
+Each profile is written to PROFILE_DIR as a collapsed-stack file
+("frame;frame;frame count" lines), ready for flamegraph.pl or speedscope.
+The root frames of every stack are the route and the auth type (jwt,
+api_key, anonymous), so several files can be concatenated and compared.
+"""
+import asyncio
+import itertools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from auth import get_current_user
+
+PROFILE_DIR             = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_SAMPLE_RATE     = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS     = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_HEADER          = b"x-profile"
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _coroutine_stack(coro) -> list[str]:
+    """Frames of a suspended coroutine chain, outermost first."""
+    names = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        names.append(_frame_name(frame))
+        awaited = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None)
+        if awaited is not None and not hasattr(awaited, "cr_frame") and not hasattr(awaited, "ag_frame"):
+            names.append(f"[await {type(awaited).__name__}]")
+            break
+        coro = awaited
+    return names
+
+
+def _thread_stack(frame, root_code) -> list[str]:
+    """Frames of a running thread, outermost first, cut at the task's root coroutine."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        if frame.f_code is root_code:
+            break
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class Profile:
+
+    def __init__(self, profile_id: str, task: asyncio.Task, method: str, auth_type: str):
+        self.id         = profile_id
+        self.task       = task
+        self.method     = method
+        self.auth_type  = auth_type
+        self.route      = "unmatched"
+        self.samples    : Counter = Counter()
+
+    def collapsed(self, samples: dict[str, int]) -> str:
+        """`samples` (a copy of self.samples) in collapsed-stack format."""
+        prefix = f"{self.method} {self.route};{self.auth_type}"
+        return "".join(f"{prefix};{stack} {count}\n" for stack, count in samples.items())
+
+
+class Profiler:
+    """Keeps the set of profiled tasks and the sampling thread."""
+
+    def __init__(
+        self,
+        directory: str = PROFILE_DIR,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        interval_ms: float = PROFILE_INTERVAL_MS,
+    ):
+        self.directory          = Path(directory)
+        self.sample_rate        = sample_rate
+        self.interval           = interval_ms / 1000
+        self.window_rate        = 0.0
+        self.window_until       = 0.0
+        self.profiles_written   = 0
+        self._active: dict[asyncio.Task, Profile] = {}
+        self._ids               = itertools.count(1)
+        self._wakeup            = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id    = 0
+
+    def enable_window(self, seconds: float, sample_rate: float = 1.0):
+        """Profile `sample_rate` of all requests for the next `seconds`."""
+        self.window_rate = sample_rate
+        self.window_until = time.monotonic() + seconds
+
+    def current_rate(self) -> float:
+        if self.window_until and time.monotonic() < self.window_until:
+            return max(self.window_rate, self.sample_rate)
+        return self.sample_rate
+
+    def status(self) -> dict:
+        return {
+            "sample_rate"       : self.current_rate(),
+            "window_remaining"  : max(0.0, self.window_until - time.monotonic()),
+            "interval_ms"       : self.interval * 1000,
+            "directory"         : str(self.directory.resolve()),
+            "in_flight"         : len(self._active),
+            "profiles_written"  : self.profiles_written,
+        }
+
+    def start(self, method: str, auth_type: str) -> Profile:
+        task = asyncio.current_task()
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+        profile = Profile(f"{int(time.time() * 1000)}-{os.getpid()}-{next(self._ids)}", task, method, auth_type)
+        self._active[task] = profile
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+        return profile
+
+    async def finish(self, profile: Profile):
+        self._active.pop(profile.task, None)
+        # The sampling thread may still add to profile.samples from a snapshot
+        # of _active taken before the pop, so the writer gets a copy
+        samples = dict(profile.samples)
+        if samples:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, profile, samples)
+            self.profiles_written += 1
+
+    def _write(self, profile: Profile, samples: dict[str, int]):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", profile.route).strip("_") or "root"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{profile.id}-{profile.method}-{slug}-{profile.auth_type}.folded"
+        path.write_text(profile.collapsed(samples))
+
+    def _run(self):
+        while True:
+            if not self._active:
+                self._wakeup.clear()
+                # re-check: start() may have run between the test and clear()
+                if not self._active:
+                    self._wakeup.wait()
+            time.sleep(self.interval)
+            self._sample()
+
+    def _sample(self):
+        running = asyncio.current_task(self._loop)
+        loop_frame = sys._current_frames().get(self._loop_thread_id)
+        for task, profile in list(self._active.items()):
+            coro = task.get_coro()
+            if task is running and loop_frame is not None:
+                stack = _thread_stack(loop_frame, getattr(coro, "cr_code", None))
+            else:
+                stack = _coroutine_stack(coro)
+            if stack:
+                profile.samples[";".join(stack)] += 1
+
+
+profiler = Profiler()
+
+
+def _auth_type(headers: dict[bytes, bytes]) -> str:
+    if headers.get(b"authorization", b"").lower().startswith(b"bearer "):
+        return "jwt"
+    if b"x-api-key" in headers:
+        return "api_key"
+    return "anonymous"
+
+
+async def _is_admin(headers: dict[bytes, bytes]) -> bool:
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        user = await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+    except HTTPException:
+        return False
+    return user.role == "admin"
+
+
+def _profile_requested(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value == b"1"
+    return False
+
+
+class ProfilingMiddleware:
+    """Decides per request whether to profile it; adds `X-Profile-Id` when it does."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rate = profiler.current_rate()
+        sampled = rate > 0 and random.random() < rate
+        if not sampled and not _profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if not sampled and not await _is_admin(headers):
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiler.start(scope["method"], _auth_type(headers))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                profile.route = route.path
+            await profiler.finish(profile)
@@ -1,18 +1,31 @@
+import math
 import os
+import time
+from typing import Optional
+from limits import parse, RateLimitItem
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from fastapi import Request
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.responses import JSONResponse
 
+from auth import get_current_user_or_api_client, TokenData, APIClientData
+from shm_storage import SharedMemoryStorage  # also registers the "shm://" storage scheme
+from metrics import PHASE_DURATION, RATE_LIMITED
+
 RATE_LIMIT_USER         = os.getenv("RATE_LIMIT_USER", "60")
 RATE_LIMIT_API_CLIENT   = os.getenv("RATE_LIMIT_API_CLIENT", "100")
+# "shm://<path>" is shared by all workers on the host ("shm://" alone puts the
+# table in shm_storage.SHM_DIR); "memory://" is per worker process, so
+# several workers would each allow the full limit
+RATE_LIMIT_STORAGE_URI  = os.getenv("RATE_LIMIT_STORAGE_URI", "shm://")
 
 
 def get_identifier(request: Request) -> str:
     """
-    Get rate limit identifier based on authentication type.
-    Uses API key for external clients, IP for JWT users.
+    Rate limit identifier for slowapi's per-address limits.
+    Uses API key for external clients, IP otherwise. Authenticated routes
+    use principal_rate_limit instead, which keys on the verified identity.
     """
     api_key = request.headers.get("X-API-Key")
     if api_key:
@@ -20,10 +33,11 @@ def get_identifier(request: Request) -> str:
 
     return get_remote_address(request)
 
-limiter = Limiter(key_func=get_identifier)
+limiter = Limiter(key_func=get_identifier, storage_uri=RATE_LIMIT_STORAGE_URI)
 
 def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
     """Custom handler for rate limit exceeded errors."""
+    RATE_LIMITED.inc("slowapi")
     return JSONResponse(
         status_code=429,
         content={
@@ -32,19 +46,90 @@ def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
         }
     )
 
-def user_rate_limit():
-    """Rate limit for authenticated users (JWT)."""
-    return limiter.limit(f"{RATE_LIMIT_USER}/minute")
 
-def api_client_rate_limit():
-    """Rate limit for external API clients."""
-    return limiter.limit(f"{RATE_LIMIT_API_CLIENT}/minute")
+class GCRA:
+    """
+    Generic cell rate algorithm: one theoretical arrival time (TAT) per key.
+
+    A limit of N per period allows a burst of N and then one request every
+    period / N seconds. Keys whose TAT is in the past carry no state and are
+    dropped, so memory only grows with recently active keys.
+    """
+
+    def __init__(self, storage_uri: str = RATE_LIMIT_STORAGE_URI, sweep_interval: float = 60.0):
+        self._shared: Optional[SharedMemoryStorage] = None
+        if storage_uri.startswith("shm://"):
+            self._shared = SharedMemoryStorage(storage_uri)
+        self._tat: dict[str, float] = {}
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def hit(self, key: str, limit: RateLimitItem) -> float:
+        """Consume one request; returns 0 if allowed, else seconds until it would be."""
+        period = limit.get_expiry()
+        emission_interval = period / limit.amount
+        tolerance = period - emission_interval
+
+        if self._shared is not None:
+            return self._shared.gcra(key, emission_interval, tolerance)
+
+        now = time.time()
+        tat = max(self._tat.get(key, now), now)
+        if tat - now > tolerance:
+            return tat - tolerance - now
+        self._tat[key] = tat + emission_interval
+
+        if now >= self._next_sweep:
+            self._next_sweep = now + self._sweep_interval
+            self._tat = {k: v for k, v in self._tat.items() if v > now}
+        return 0.0
+
+    def __len__(self) -> int:
+        return len(self._tat)
 
 
-def combined_rate_limit():
+def _per_minute(limit: str) -> RateLimitItem:
+    return parse(f"{limit}/minute" if limit.isdigit() else limit)
+
+
+USER_LIMIT          = _per_minute(RATE_LIMIT_USER)
+API_CLIENT_LIMIT    = _per_minute(RATE_LIMIT_API_CLIENT)
+
+gcra = GCRA()
+
+
+def principal_rate_limit(auth_dependency=get_current_user_or_api_client, limit: Optional[str] = None):
     """
-    Combined rate limit that applies different limits based on auth type.
-    Uses the higher API client limit as the base, actual enforcement
-    is handled by the identifier function.
+    Dependency factory that rate limits per authenticated principal and route.
+
+    Keys on the JWT user_id or the API client_id rather than the remote
+    address. Without an explicit `limit` the configured per-type limit is
+    used: RATE_LIMIT_USER for users, RATE_LIMIT_API_CLIENT for API clients.
     """
-    return limiter.limit(f"{RATE_LIMIT_API_CLIENT}/minute")
+    fixed_limit = _per_minute(limit) if limit else None
+
+    async def dependency(
+        request: Request,
+        auth: TokenData | APIClientData = Depends(auth_dependency),
+    ):
+        if isinstance(auth, TokenData):
+            principal, type_limit = f"user:{auth.user_id}", USER_LIMIT
+        else:
+            principal, type_limit = f"api:{auth.client_id}", API_CLIENT_LIMIT
+
+        route = request.scope.get("route")
+        started = time.perf_counter()
+        retry_after = gcra.hit(
+            f"{route.path if route else request.url.path}:{principal}",
+            fixed_limit or type_limit,
+        )
+        PHASE_DURATION.observe(time.perf_counter() - started, "rate_limit")
+        if retry_after > 0:
+            RATE_LIMITED.inc("principal")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    return dependency
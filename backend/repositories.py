@@ -0,0 +1,451 @@
+"""
+Storage access for users and API clients.
+
+The backend is picked once, at import time, from DATABASE_TYPE. Request
+handlers only talk to `user_repository` / `api_client_repository`, and a
+database session (SQLite) or collection handle (Mongo) is only acquired
+inside the method that actually runs a query. SQLite lookups use the read
+pool (AsyncReadSessionLocal), which is the main pool unless
+SQLITE_READ_POOL_SIZE is set.
+
+Every lookup reads only the fields its caller needs: SQLite selects those
+columns (no ORM objects are built) and Mongo passes a projection. Record
+fields a lookup does not load are None.
+"""
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from config import DATABASE_TYPE
+from user_profiles import evict_user_profile
+
+
+@dataclass
+class UserRecord:
+    id              : str
+    username        : str
+    email           : str
+    role            : str
+    hashed_password : Optional[str] = None
+
+
+@dataclass
+class APIClientRecord:
+    id              : str
+    name            : str
+    client_id       : str
+    is_active       : bool
+    created_at      : Optional[datetime] = None
+    hashed_secret   : Optional[str] = None
+    created_by      : Optional[str] = None
+
+
+# Fields loaded by each lookup
+USER_LOGIN_FIELDS           = ("id", "username", "email", "role", "hashed_password")
+USER_PROFILE_FIELDS         = ("id", "username", "email", "role")
+API_CLIENT_AUTH_FIELDS      = ("id", "name", "client_id", "is_active", "hashed_secret")
+API_CLIENT_LIST_FIELDS      = ("id", "name", "client_id", "is_active", "created_at")
+
+
+class DuplicateError(Exception):
+    """An insert hit a unique index; `field` is the offending field, if known."""
+
+    def __init__(self, field: Optional[str]):
+        super().__init__(f"Duplicate value for {field or 'a unique field'}")
+        self.field = field
+
+
+# API error messages for DuplicateError.field
+DUPLICATE_FIELD_MESSAGES = {
+    "username"  : "Username already registered",
+    "email"     : "Email already registered",
+}
+
+
+class UserRepository(ABC):
+    """Interface for user storage."""
+
+    @abstractmethod
+    async def find_by_username(self, username: str) -> Optional[UserRecord]:
+        """USER_LOGIN_FIELDS of a user, for password checks."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_by_id(self, user_id: str) -> Optional[UserRecord]:
+        """USER_PROFILE_FIELDS of a user; hashed_password is not loaded."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create(self, username: str, email: str, role: str, hashed_password: str) -> UserRecord:
+        """Insert a user in one round trip; raises DuplicateError on a taken username/email."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_role(self, user_id: str, role: str) -> Optional[UserRecord]:
+        """
+        Returns the USER_PROFILE_FIELDS of the updated user. Implementations
+        must call evict_user_profile, as every user mutation does.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def bulk_create(self, users: list[dict]) -> dict[int, Optional[str]]:
+        """
+        Insert many users (username, email, role, hashed_password) at once.
+        Rows that hit a unique index are skipped without aborting the batch;
+        returns {index in `users`: duplicate field} for those rows.
+        """
+        raise NotImplementedError
+
+
+class APIClientRepository(ABC):
+    """Interface for API client storage."""
+
+    @abstractmethod
+    async def find_active_by_client_id(self, client_id: str) -> Optional[APIClientRecord]:
+        """API_CLIENT_AUTH_FIELDS of an active client."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_page_by_user(
+        self, user_id: str, limit: int, after: Optional[tuple[datetime, str]] = None
+    ) -> list[APIClientRecord]:
+        """
+        API_CLIENT_LIST_FIELDS of up to `limit` of the user's clients ordered
+        by (created_at, id), starting after the (created_at, id) key of the
+        previous page's last row. Raises ValueError if the id in `after` is
+        malformed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create(self, name: str, client_id: str, hashed_secret: str, created_by: str) -> APIClientRecord:
+        """Returns at least the API_CLIENT_LIST_FIELDS of the new client."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def deactivate(self, client_id: str, user_id: str) -> bool:
+        """False if the user has no active client with this client_id."""
+        raise NotImplementedError
+
+
+# ============================================================================
+# SQLite (SQLAlchemy AsyncSession)
+# ============================================================================
+
+def _columns(model, fields: tuple[str, ...]) -> list:
+    return [getattr(model, name) for name in fields]
+
+
+def _user_from_row(row) -> UserRecord:
+    """UserRecord of a row selected with _columns(User, ...)."""
+    return UserRecord(**{**row._asdict(), "id": str(row.id)})
+
+
+def _api_client_from_row(row) -> APIClientRecord:
+    """APIClientRecord of a row selected with _columns(APIClient, ...)."""
+    return APIClientRecord(**{**row._asdict(), "id": str(row.id)})
+
+
+def _sqlite_unique_field(exc: "IntegrityError") -> Optional[str]:
+    """'UNIQUE constraint failed: users.email' -> 'email'."""
+    message = str(exc.orig)
+    if "UNIQUE constraint failed: " not in message:
+        return None
+    column = message.split("UNIQUE constraint failed: ", 1)[1].split(",")[0]
+    return column.rsplit(".", 1)[-1].strip()
+
+
+class SQLiteUserRepository(UserRepository):
+
+    async def _find_one(self, fields: tuple[str, ...], *criteria) -> Optional[UserRecord]:
+        async with database.AsyncReadSessionLocal() as db:
+            row = (await db.execute(select(*_columns(User, fields)).where(*criteria))).first()
+            return _user_from_row(row) if row else None
+
+    async def find_by_username(self, username: str) -> Optional[UserRecord]:
+        return await self._find_one(USER_LOGIN_FIELDS, User.username == username)
+
+    async def find_by_id(self, user_id: str) -> Optional[UserRecord]:
+        return await self._find_one(USER_PROFILE_FIELDS, User.id == int(user_id))
+
+    async def create(self, username: str, email: str, role: str, hashed_password: str) -> UserRecord:
+        async with database.AsyncSessionLocal() as db:
+            user = User(
+                username        =username,
+                email           =email,
+                role            =role,
+                hashed_password =hashed_password,
+            )
+            db.add(user)
+            try:
+                await db.commit()
+            except IntegrityError as exc:
+                raise DuplicateError(_sqlite_unique_field(exc)) from exc
+            return UserRecord(
+                id              =str(user.id),
+                username        =username,
+                email           =email,
+                role            =role,
+                hashed_password =hashed_password,
+            )
+
+    async def update_role(self, user_id: str, role: str) -> Optional[UserRecord]:
+        async with database.AsyncSessionLocal() as db:
+            # UPDATE ... RETURNING: one statement, no row loaded beforehand
+            row = (await db.execute(
+                update(User)
+                .where(User.id == int(user_id))
+                .values(role=role)
+                .returning(*_columns(User, USER_PROFILE_FIELDS))
+            )).first()
+            await db.commit()
+        if not row:
+            return None
+        evict_user_profile(user_id)
+        return _user_from_row(row)
+
+    async def bulk_create(self, users: list[dict]) -> dict[int, Optional[str]]:
+        if not users:
+            return {}
+        async with database.AsyncSessionLocal() as db:
+            # One executemany; ON CONFLICT DO NOTHING skips duplicates (also
+            # within the batch) and RETURNING tells which rows went in.
+            # Rows are inserted in order, so the first of several identical
+            # rows is the one that went in.
+            inserted = Counter((await db.execute(
+                sqlite_insert(User).on_conflict_do_nothing().returning(User.username, User.email),
+                users,
+            )).tuples())
+            skipped = {}
+            for i, u in enumerate(users):
+                key = (u["username"], u["email"])
+                if inserted[key]:
+                    inserted[key] -= 1
+                else:
+                    skipped[i] = u
+            if not skipped:
+                await db.commit()
+                return {}
+
+            # Classify the skipped rows with a single query
+            usernames = {u["username"] for u in skipped.values()}
+            emails = {u["email"] for u in skipped.values()}
+            taken = (await db.execute(
+                select(User.username, User.email).where(
+                    or_(User.username.in_(usernames), User.email.in_(emails))
+                )
+            )).all()
+            await db.commit()
+
+        taken_usernames = {row.username for row in taken}
+        taken_emails = {row.email for row in taken}
+        return {
+            i: "username" if u["username"] in taken_usernames
+            else "email" if u["email"] in taken_emails
+            else None
+            for i, u in skipped.items()
+        }
+
+
+class SQLiteAPIClientRepository(APIClientRepository):
+
+    async def find_active_by_client_id(self, client_id: str) -> Optional[APIClientRecord]:
+        async with database.AsyncReadSessionLocal() as db:
+            row = (await db.execute(select(*_columns(APIClient, API_CLIENT_AUTH_FIELDS)).where(
+                APIClient.client_id == client_id,
+                APIClient.is_active == True
+            ))).first()
+            return _api_client_from_row(row) if row else None
+
+    async def find_page_by_user(
+        self, user_id: str, limit: int, after: Optional[tuple[datetime, str]] = None
+    ) -> list[APIClientRecord]:
+        stmt = select(*_columns(APIClient, API_CLIENT_LIST_FIELDS)).where(APIClient.created_by == int(user_id))
+        if after is not None:
+            # created_at is stored as CURRENT_TIMESTAMP text, which a bound
+            # datetime does not compare equal to; compare against the stored
+            # key of the cursor row instead. The row-value comparison lets
+            # SQLite seek the (created_by, created_at, id) index.
+            previous = aliased(APIClient)
+            last_key = select(previous.created_at, previous.id).where(previous.id == int(after[1]))
+            stmt = stmt.where(tuple_(APIClient.created_at, APIClient.id) > last_key.scalar_subquery())
+        stmt = stmt.order_by(APIClient.created_at, APIClient.id).limit(limit)
+        async with database.AsyncReadSessionLocal() as db:
+            rows = await db.execute(stmt)
+            return [_api_client_from_row(row) for row in rows]
+
+    async def create(self, name: str, client_id: str, hashed_secret: str, created_by: str) -> APIClientRecord:
+        async with database.AsyncSessionLocal() as db:
+            # RETURNING hands back the generated id and created_at, so there
+            # is no refresh query
+            row = (await db.execute(
+                insert(APIClient)
+                .values(
+                    name            =name,
+                    client_id       =client_id,
+                    hashed_secret   =hashed_secret,
+                    created_by      =int(created_by),
+                    is_active       =True,
+                )
+                .returning(*_columns(APIClient, API_CLIENT_LIST_FIELDS))
+            )).one()
+            await db.commit()
+            return _api_client_from_row(row)
+
+    async def deactivate(self, client_id: str, user_id: str) -> bool:
+        async with database.AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(APIClient)
+                .where(
+                    APIClient.client_id == client_id,
+                    APIClient.created_by == int(user_id),
+                    # SQLite counts matched rows: a repeated delete must not match
+                    APIClient.is_active == True,
+                )
+                .values(is_active=False)
+            )
+            await db.commit()
+            return result.rowcount > 0
+
+
+# ============================================================================
+# MongoDB (Motor)
+# ============================================================================
+
+def _projection(fields: tuple[str, ...]) -> dict:
+    """Mongo projection of record fields; _id is always returned."""
+    return {name: 1 for name in fields if name != "id"}
+
+
+def _user_from_doc(doc: dict) -> UserRecord:
+    return UserRecord(
+        id              =str(doc["_id"]),
+        username        =doc["username"],
+        email           =doc["email"],
+        role            =doc["role"],
+        hashed_password =doc.get("hashed_password"),
+    )
+
+
+def _api_client_from_doc(doc: dict) -> APIClientRecord:
+    return APIClientRecord(
+        id              =str(doc["_id"]),
+        name            =doc["name"],
+        client_id       =doc["client_id"],
+        is_active       =doc.get("is_active", True),
+        created_at      =doc.get("created_at"),
+        hashed_secret   =doc.get("hashed_secret"),
+        created_by      =doc.get("created_by"),
+    )
+
+
+def _mongo_duplicate_field(details: Optional[dict], message: str) -> Optional[str]:
+    """Field of a duplicate-key write error, from its details or message."""
+    key_pattern = (details or {}).get("keyPattern")
+    if key_pattern:
+        return next(iter(key_pattern))
+    # Older servers only report the index name: "... index: email_1 dup key ..."
+    if "index: " in message:
+        return message.split("index: ", 1)[1].split()[0].rsplit("_", 1)[0]
+    return None
+
+
+class MongoUserRepository(UserRepository):
+
+    async def find_by_username(self, username: str) -> Optional[UserRecord]:
+        doc = await UserCollection.find_by_username(get_database(), username, _projection(USER_LOGIN_FIELDS))
+        return _user_from_doc(doc) if doc else None
+
+    async def find_by_id(self, user_id: str) -> Optional[UserRecord]:
+        doc = await UserCollection.find_by_id(get_database(), user_id, _projection(USER_PROFILE_FIELDS))
+        return _user_from_doc(doc) if doc else None
+
+    async def create(self, username: str, email: str, role: str, hashed_password: str) -> UserRecord:
+        try:
+            doc = await UserCollection.create(get_database(), {
+                "username"          : username,
+                "email"             : email,
+                "role"              : role,
+                "hashed_password"   : hashed_password,
+            })
+        except DuplicateKeyError as exc:
+            raise DuplicateError(_mongo_duplicate_field(exc.details, str(exc))) from exc
+        return _user_from_doc(doc)
+
+    async def update_role(self, user_id: str, role: str) -> Optional[UserRecord]:
+        doc = await UserCollection.update_role(get_database(), user_id, role, _projection(USER_PROFILE_FIELDS))
+        evict_user_profile(user_id)
+        return _user_from_doc(doc) if doc else None
+
+    async def bulk_create(self, users: list[dict]) -> dict[int, Optional[str]]:
+        if not users:
+            return {}
+        try:
+            await UserCollection.create_many(get_database(), users)
+        except BulkWriteError as exc:
+            duplicates = {}
+            for error in exc.details.get("writeErrors", []):
+                if error.get("code") != 11000:
+                    raise
+                duplicates[error["index"]] = _mongo_duplicate_field(error, error.get("errmsg", ""))
+            return duplicates
+        return {}
+
+
+class MongoAPIClientRepository(APIClientRepository):
+
+    async def find_active_by_client_id(self, client_id: str) -> Optional[APIClientRecord]:
+        doc = await APIClientCollection.find_by_client_id(
+            get_database(), client_id, _projection(API_CLIENT_AUTH_FIELDS)
+        )
+        return _api_client_from_doc(doc) if doc else None
+
+    async def find_page_by_user(
+        self, user_id: str, limit: int, after: Optional[tuple[datetime, str]] = None
+    ) -> list[APIClientRecord]:
+        if after is not None:
+            if not ObjectId.is_valid(after[1]):
+                raise ValueError(f"Invalid id in cursor: {after[1]!r}")
+            after = (after[0], ObjectId(after[1]))
+        docs = await APIClientCollection.find_page_by_user(
+            get_database(), user_id, limit, after, _projection(API_CLIENT_LIST_FIELDS)
+        )
+        return [_api_client_from_doc(d) for d in docs]
+
+    async def create(self, name: str, client_id: str, hashed_secret: str, created_by: str) -> APIClientRecord:
+        doc = await APIClientCollection.create(get_database(), {
+            "name"              : name,
+            "client_id"         : client_id,
+            "hashed_secret"     : hashed_secret,
+            "created_by"        : created_by,
+            "is_active"         : True,
+            "created_at"        : datetime.now(timezone.utc),
+        })
+        return _api_client_from_doc(doc)
+
+    async def deactivate(self, client_id: str, user_id: str) -> bool:
+        return await APIClientCollection.deactivate(get_database(), client_id, user_id)
+
+
+if DATABASE_TYPE == "mongo":
+    from bson import ObjectId
+    from pymongo.errors import BulkWriteError, DuplicateKeyError
+    from database_mongo import get_database
+    from models_mongo import UserCollection, APIClientCollection
+
+    user_repository         : UserRepository        = MongoUserRepository()
+    api_client_repository   : APIClientRepository   = MongoAPIClientRepository()
+else:
+    from sqlalchemy import select, insert, update, or_, tuple_
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    from sqlalchemy.exc import IntegrityError
+    from sqlalchemy.orm import aliased
+    # Session factories are looked up per call: they exist once init_engines() ran
+    import database
+    from models import User, APIClient
+
+    user_repository         : UserRepository        = SQLiteUserRepository()
+    api_client_repository   : APIClientRepository   = SQLiteAPIClientRepository()
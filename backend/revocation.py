@@ -0,0 +1,276 @@
+"""
+Revocation list for users' access tokens and for API clients.
+
+Each entry records when it was revoked: a user's tokens issued before that
+moment are rejected (`iat` is compared against it), an API client is
+rejected outright. Entries are kept until the given expiry and then
+forgotten. Where they live is
+set by REVOCATION_STORAGE_URI:
+
+- "shm://<path>" (the default; "shm://" alone keeps it in
+  shm_storage.SHM_DIR): a shared-memory table (shm_storage.py) seen by every
+  worker process on the host, so a revocation handled by one worker applies
+  to all of them at once. The table never evicts a live entry: when the
+  key's group is full, revoking raises StorageFull and the caller must
+  refuse the request.
+- "memory://": a per-process dict. Only correct with a single worker process.
+
+Either way a Bloom filter answers "definitely not revoked" first, so only
+filter hits reach the exact set. With "shm://" the filter's bits are shared
+too (in "<path>.bloom") and are read without a lock. Bloom filters cannot
+delete: the memory filter is rebuilt after expired entries are
+garbage-collected, the shared one from the table's live keys once more keys
+were added to it than it is sized for.
+"""
+import fcntl
+import hashlib
+import math
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+from shm_storage import SharedMemoryStorage, SLOTS_PER_GROUP, default_path, map_file
+
+REVOCATION_BLOOM_CAPACITY   = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_FP_RATE    = float(os.getenv("REVOCATION_BLOOM_FP_RATE", "0.001"))
+REVOCATION_GC_INTERVAL      = int(os.getenv("REVOCATION_GC_INTERVAL", "60"))
+REVOKED_CLIENT_RETENTION    = int(os.getenv("REVOKED_CLIENT_RETENTION", "86400"))
+REVOCATION_STORAGE_URI      = os.getenv("REVOCATION_STORAGE_URI", "shm://")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, using double hashing."""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        capacity            = max(1, capacity)
+        self.capacity       = capacity
+        self.fp_rate        = fp_rate
+        self.num_bits       = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes     = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits          = self._allocate((self.num_bits + 7) // 8)
+
+    def _allocate(self, num_bytes: int):
+        return bytearray(num_bytes)
+
+    def _hashes(self, item: str) -> tuple[int, int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def add(self, item: str):
+        h1, h2 = self._hashes(item)
+        for i in range(self.num_hashes):
+            pos = (h1 + i * h2) % self.num_bits
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        h1, h2 = self._hashes(item)
+        bits, num_bits = self._bits, self.num_bits
+        for i in range(self.num_hashes):
+            pos = (h1 + i * h2) % num_bits
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+
+class SharedBloomFilter(BloomFilter):
+    """
+    Bloom filter in front of a SharedMemoryStorage table, with its bits in a
+    shared-memory file of its own. Positions come from the table's 64-bit
+    key hashes, so the filter can be rebuilt from the table's live keys.
+    Adding takes a lock on the file; lookups do not. A rebuild only ever
+    clears the bits of keys that are no longer live, so a concurrent lookup
+    never misses a live key.
+    """
+
+    HEADER = struct.Struct("<QQ")   # keys added since the last rebuild, rebuild threshold
+
+    def __init__(self, storage: SharedMemoryStorage, capacity: int, fp_rate: float):
+        self.path       = f"{storage.path}.bloom"
+        self._storage   = storage
+        self._lock      = threading.Lock()
+        super().__init__(capacity, fp_rate)
+
+    def _allocate(self, num_bytes: int):
+        self._fd, self._map = map_file(self.path, self.HEADER.size + num_bytes)
+        return memoryview(self._map)[self.HEADER.size:]
+
+    @staticmethod
+    def _split(key_hash: int) -> tuple[int, int]:
+        return key_hash >> 1, ((key_hash >> 32) | (key_hash << 32)) & 0xFFFFFFFFFFFFFFFF | 1
+
+    def _hashes(self, item: str) -> tuple[int, int]:
+        return self._split(self._storage.key_hash(item))
+
+    def _set_bits(self, bits, key_hash: int):
+        h1, h2 = self._split(key_hash)
+        for i in range(self.num_hashes):
+            pos = (h1 + i * h2) % self.num_bits
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def add(self, item: str):
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                self._set_bits(self._bits, self._storage.key_hash(item))
+                added, threshold = self.HEADER.unpack_from(self._map)
+                added += 1
+                if added > max(threshold, self.capacity):
+                    live = self._storage.live_hashes()
+                    bits = bytearray(len(self._bits))
+                    for key_hash in live:
+                        self._set_bits(bits, key_hash)
+                    self._bits[:] = bits
+                    added, threshold = len(live), 2 * len(live)
+                self.HEADER.pack_into(self._map, 0, added, threshold)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    @property
+    def added(self) -> int:
+        """Keys added since the filter was last rebuilt, across all processes."""
+        return self.HEADER.unpack_from(self._map)[0]
+
+
+class RevocationList:
+
+    def __init__(
+        self,
+        capacity: int = REVOCATION_BLOOM_CAPACITY,
+        fp_rate: float = REVOCATION_BLOOM_FP_RATE,
+        gc_interval: int = REVOCATION_GC_INTERVAL,
+        storage_uri: str = REVOCATION_STORAGE_URI,
+    ):
+        self._shared: Optional[SharedMemoryStorage] = None
+        if storage_uri.startswith("shm://"):
+            parsed = urlparse(storage_uri)
+            query = f"{parsed.query}&evict=false" if parsed.query else "evict=false"
+            self._shared = SharedMemoryStorage(f"shm://{parsed.path or default_path('revocation')}?{query}")
+            self._filter = SharedBloomFilter(self._shared, capacity, fp_rate)
+        elif storage_uri == "memory://":
+            self._filter = BloomFilter(capacity, fp_rate)
+        else:
+            raise ValueError(f"Unsupported REVOCATION_STORAGE_URI: {storage_uri}")
+        self.capacity           = capacity
+        self.fp_rate            = fp_rate
+        self.gc_interval        = gc_interval
+        self.filter_hits        = 0
+        self.false_positives    = 0
+        self._revoked: dict[str, tuple[float, float]] = {}     # key -> (expires at, revoked at)
+        self._next_gc           = time.time() + gc_interval
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    @property
+    def shared(self) -> bool:
+        """Whether revocations are seen by every worker process on the host."""
+        return self._shared is not None
+
+    def revoke(self, key: str, expires_at: float):
+        """
+        Revoke `key` as of now, until `expires_at` (unix time); afterwards it
+        is forgotten. Raises StorageFull if the shared table has no room for it.
+        """
+        now = time.time()
+        if expires_at <= now:
+            return
+        if self._shared is not None:
+            # the table stores integers: the revocation time in microseconds, rounded up
+            self._shared.set_max(key, math.ceil(now * 1e6), expires_at - now)
+            self._filter.add(key)
+            return
+        previous = self._revoked.get(key, (0.0, 0.0))
+        self._revoked[key] = (max(expires_at, previous[0]), max(now, previous[1]))
+        if len(self._revoked) > self._filter.capacity:
+            self._rebuild()
+        else:
+            self._filter.add(key)
+        self.gc()
+
+    def revoked_at(self, key: Optional[str]) -> float:
+        """When `key` was last revoked (unix time), or 0 if it is not revoked."""
+        if not key or (self._shared is None and not self._revoked) or key not in self._filter:
+            return 0.0
+
+        self.filter_hits += 1
+        if self._shared is not None:
+            revoked_at = self._shared.get(key) / 1e6
+            if not revoked_at:
+                self.false_positives += 1
+            return revoked_at
+        entry = self._revoked.get(key)
+        if entry is None:
+            self.false_positives += 1
+            return 0.0
+        return entry[1] if entry[0] > time.time() else 0.0
+
+    def is_revoked(self, key: Optional[str]) -> bool:
+        return self.revoked_at(key) > 0
+
+    def revoke_user_tokens(self, user_id: str, expires_at: float):
+        """Revoke every token issued to `user_id` so far; all of them expire by `expires_at`."""
+        self.revoke(f"user:{user_id}", expires_at)
+
+    def is_user_token_revoked(self, user_id: str, issued_at: Optional[float]) -> bool:
+        revoked_at = self.revoked_at(f"user:{user_id}")
+        return revoked_at > 0 and (issued_at or 0) < revoked_at
+
+    def revoke_client(self, client_id: str):
+        self.revoke(f"client:{client_id}", time.time() + REVOKED_CLIENT_RETENTION)
+
+    def is_client_revoked(self, client_id: str) -> bool:
+        return self.is_revoked(f"client:{client_id}")
+
+    def gc(self, force: bool = False):
+        """Drop entries past their expiry and rebuild the filter without them."""
+        now = time.time()
+        if self._shared is not None or (not force and now < self._next_gc):
+            return
+        self._next_gc = now + self.gc_interval
+
+        expired = [key for key, (expires_at, _) in self._revoked.items() if expires_at <= now]
+        if expired:
+            for key in expired:
+                del self._revoked[key]
+            self._rebuild()
+
+    def _rebuild(self):
+        self._filter = BloomFilter(max(self.capacity, 2 * len(self._revoked)), self.fp_rate)
+        for key in self._revoked:
+            self._filter.add(key)
+
+    def stats(self) -> dict:
+        if self._shared is not None:
+            return {
+                "storage"               : "shm",
+                "path"                  : self._shared.path,
+                "slots"                 : self._shared.num_groups * SLOTS_PER_GROUP,
+                "bloom_capacity"        : self._filter.capacity,
+                "bloom_hashes"          : self._filter.num_hashes,
+                "bloom_memory_bytes"    : self._filter.memory_bytes,
+                "bloom_added"           : self._filter.added,
+                "filter_hits"           : self.filter_hits,
+                "false_positives"       : self.false_positives,
+            }
+        exact_bytes = sys.getsizeof(self._revoked) + sum(sys.getsizeof(k) for k in self._revoked)
+        return {
+            "storage"               : "memory",
+            "revoked"               : len(self._revoked),
+            "bloom_capacity"        : self._filter.capacity,
+            "bloom_hashes"          : self._filter.num_hashes,
+            "bloom_memory_bytes"    : self._filter.memory_bytes,
+            "exact_memory_bytes"    : exact_bytes,
+            "filter_hits"           : self.filter_hits,
+            "false_positives"       : self.false_positives,
+        }
+
+
+revocation_list = RevocationList()
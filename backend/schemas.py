@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 from datetime import datetime
 
@@ -62,6 +62,7 @@ class APIClientCreateResponse(BaseModel):
 
 class APIClientListResponse(BaseModel):
     clients: list[APIClientResponse]
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page; None on the last page
 
 class UserDetailsResponse(BaseModel):
     id: str
@@ -78,3 +79,8 @@ class ToggleRoleResponse(BaseModel):
     expires_in: int
     user: UserResponse
     message: str
+
+
+class ProfilingWindowRequest(BaseModel):
+    seconds     : float = Field(gt=0, le=3600)
+    sample_rate : float = Field(default=1.0, gt=0, le=1)
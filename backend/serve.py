@@ -0,0 +1,354 @@
+"""
+Production server: a pre-forked pool of uvicorn workers.
+
+- The number of workers defaults to the CPU count.
+- Every worker slot has its own SO_REUSEPORT socket on the port, so the
+  kernel spreads new connections evenly across the workers. The master
+  opens these sockets and keeps them open, and a replacement worker takes
+  over its slot's socket. A listening socket therefore never closes during
+  a restart, and no queued connection is reset. Where SO_REUSEPORT does not
+  exist, all workers share one socket.
+- Workers run on uvloop and httptools when they are installed (uvicorn's
+  "auto" choice), and on asyncio and h11 otherwise.
+- The app is imported once, before forking, so the workers share its memory
+  copy-on-write. The master freezes the GC first, so collections in a worker
+  do not write to the shared pages.
+- SIGHUP restarts the workers one at a time. A worker is only stopped once
+  its replacement is accepting connections, and a replacement that fails to
+  start aborts the restart with the old worker still serving.
+- SIGTERM and SIGINT stop every worker gracefully: each one finishes its
+  in-flight requests and runs the lifespan shutdown.
+
+Rate limits and revocations must be shared by the workers. With more than
+one worker, the server refuses to start if RATE_LIMIT_STORAGE_URI or
+REVOCATION_STORAGE_URI is "memory://" (per process); their default
+"shm://" storage is shared by every process on the host.
+
+A preloaded app is not re-imported by a rolling restart. To deploy new code,
+set SERVE_PRELOAD=false, so each worker imports the app itself and SIGHUP
+picks up the new code. Starting a second `serve` on the same port and then
+stopping the first also works, but stopping it resets the connections still
+queued on its sockets unless the host sets net.ipv4.tcp_migrate_req=1.
+
+    cd backend && python -m serve [--workers N] [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import asyncio
+import gc
+import importlib.util
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Optional
+
+import uvicorn
+from dotenv import load_dotenv
+
+SERVE_HOST                  = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT                  = int(os.getenv("SERVE_PORT", "8000"))
+SERVE_WORKERS               = int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1)))
+SERVE_PRELOAD               = os.getenv("SERVE_PRELOAD", "true").lower() == "true"
+SERVE_BACKLOG               = int(os.getenv("SERVE_BACKLOG", "2048"))
+SERVE_ACCESS_LOG            = os.getenv("SERVE_ACCESS_LOG", "false").lower() == "true"
+SERVE_LOG_LEVEL             = os.getenv("SERVE_LOG_LEVEL", "info")
+# Seconds a stopping worker gets to finish its in-flight requests
+SERVE_GRACEFUL_TIMEOUT      = int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+# Seconds a new worker gets to run the lifespan startup and start listening
+SERVE_READY_TIMEOUT         = int(os.getenv("SERVE_READY_TIMEOUT", "60"))
+
+APP                         = "main:app"
+REUSE_PORT                  = hasattr(socket, "SO_REUSEPORT")
+STOP_SIGNALS                = (signal.SIGTERM, signal.SIGINT)
+# Settings whose "memory://" storage is per process: (variable, module defining it)
+SHARED_STATE_SETTINGS       = (
+    ("RATE_LIMIT_STORAGE_URI", "rate_limiter"),
+    ("REVOCATION_STORAGE_URI", "revocation"),
+)
+SHUTDOWN_ACCEPT_GRACE       = 0.5
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def listen_socket(host: str, port: int, reuse_port: bool = REUSE_PORT, backlog: int = SERVE_BACKLOG) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server of one worker: reports readiness on a pipe and exits when the master is gone."""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int, master_pid: int):
+        super().__init__(config)
+        self.ready_fd   = ready_fd
+        self.master_pid = master_pid
+
+    async def startup(self, sockets: Optional[list[socket.socket]] = None):
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            os.write(self.ready_fd, b"1")
+        os.close(self.ready_fd)
+
+    async def shutdown(self, sockets: Optional[list[socket.socket]] = None):
+        # uvicorn closes every connection that is idle when shutdown begins,
+        # including one accepted an instant ago whose request has not been
+        # read yet. Stop accepting first and give those a moment to arrive.
+        for server in self.servers:
+            server.close()
+        await asyncio.sleep(SHUTDOWN_ACCEPT_GRACE)
+        await super().shutdown(sockets=sockets)
+
+    async def on_tick(self, counter: int) -> bool:
+        # Runs every 0.1s; a worker orphaned by a killed master shuts down
+        if os.getppid() != self.master_pid:
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+
+class Supervisor:
+    """Forks the workers, replaces the ones that die and handles SIGHUP/SIGTERM/SIGINT."""
+
+    def __init__(self, config: uvicorn.Config, workers: int, host: str, port: int):
+        self.config         = config
+        self.num_workers    = max(1, workers)
+        self.host           = host
+        self.port           = port
+        # pid -> slot, the index of the worker's socket in self.sockets
+        self.workers        : dict[int, int] = {}
+        # pid -> time after which a stopping worker is killed
+        self.retiring       : dict[int, float] = {}
+        self.signals        : list[int] = []
+        self.sockets        : list[socket.socket] = []
+
+    def run(self) -> int:
+        self.sockets = [
+            listen_socket(self.host, self.port) for _ in range(self.num_workers if REUSE_PORT else 1)
+        ]
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        signal.set_wakeup_fd(self._wakeup_w)
+        for sig in (*STOP_SIGNALS, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(sig, self._on_signal)
+
+        logger.info(
+            "Starting %d workers on %s:%d (%s, %s, %s)", self.num_workers, self.host, self.port,
+            "SO_REUSEPORT" if REUSE_PORT else "shared socket",
+            "uvloop" if _installed("uvloop") else "asyncio",
+            "httptools" if _installed("httptools") else "h11",
+        )
+        for slot in range(self.num_workers):
+            if not self._start_worker(slot):
+                if not any(sig in STOP_SIGNALS for sig in self.signals):
+                    logger.error("A worker failed to start; shutting down")
+                self.stop()
+                return 1
+
+        while True:
+            self._sleep(1.0)
+            self._reap()
+            self._kill_overdue()
+            signals, self.signals = self.signals, []
+            if any(sig in STOP_SIGNALS for sig in signals):
+                self.stop()
+                return 0
+            if signal.SIGHUP in signals:
+                self.rolling_restart()
+            # Replace crashed workers, one per second at most
+            vacant = set(range(self.num_workers)) - set(self.workers.values())
+            if vacant:
+                self._start_worker(min(vacant))
+
+    def rolling_restart(self):
+        logger.info("Rolling restart of %d workers", len(self.workers))
+        for old, slot in list(self.workers.items()):
+            if not self._start_worker(slot):
+                logger.error("Rolling restart aborted; the remaining workers keep serving")
+                return
+            self._retire(old)
+        logger.info("Rolling restart done")
+
+    def stop(self):
+        logger.info("Stopping %d workers", len(self.workers))
+        for pid in list(self.workers):
+            self._retire(pid)
+        while self.retiring:
+            self._sleep(0.1)
+            self._reap()
+            self._kill_overdue()
+        signal.set_wakeup_fd(-1)
+        for sock in self.sockets:
+            sock.close()
+
+    def _start_worker(self, slot: int) -> bool:
+        """Fork a worker for `slot` and wait until it accepts connections."""
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            self._run_worker(slot, ready_w)
+        os.close(ready_w)
+        self.workers[pid] = slot
+        try:
+            if self._wait_ready(pid, ready_r):
+                return True
+        finally:
+            os.close(ready_r)
+        if pid in self.workers:
+            self._retire(pid)
+        return False
+
+    def _run_worker(self, slot: int, ready_fd: int):
+        """Body of a forked worker; never returns."""
+        status = 0
+        try:
+            # Own process group: a terminal's Ctrl-C reaches only the master,
+            # which then stops the workers with a single SIGTERM
+            os.setpgid(0, 0)
+            signal.set_wakeup_fd(-1)
+            os.close(self._wakeup_r)
+            os.close(self._wakeup_w)
+            for sig in (*STOP_SIGNALS, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+            sock = self.sockets[slot % len(self.sockets)]
+            for other in self.sockets:
+                if other is not sock:
+                    other.close()
+            server = WorkerServer(self.config, ready_fd, os.getppid())
+            server.run(sockets=[sock])
+            if not server.started:
+                status = 3
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        finally:
+            os._exit(status)
+
+    def _wait_ready(self, pid: int, ready_fd: int) -> bool:
+        deadline = time.monotonic() + SERVE_READY_TIMEOUT
+        while not any(sig in STOP_SIGNALS for sig in self.signals):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error("Worker [%d] was not ready after %ds", pid, SERVE_READY_TIMEOUT)
+                return False
+            readable, _, _ = select.select([ready_fd, self._wakeup_r], [], [], remaining)
+            if ready_fd in readable:
+                if os.read(ready_fd, 1):
+                    return True
+                logger.error("Worker [%d] failed to start", pid)
+                return False
+            self._drain_wakeup()
+        return False
+
+    def _retire(self, pid: int):
+        """Ask a worker to shut down gracefully; it is killed if it takes too long."""
+        self.workers.pop(pid, None)
+        self.retiring[pid] = time.monotonic() + SERVE_GRACEFUL_TIMEOUT + 5
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in self.retiring.items():
+            if now > deadline:
+                logger.warning("Worker [%d] did not stop within %ds; killing it", pid, SERVE_GRACEFUL_TIMEOUT)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.retiring.pop(pid, None) is None and pid in self.workers:
+                del self.workers[pid]
+                logger.warning("Worker [%d] exited unexpectedly (status %d)", pid, os.waitstatus_to_exitcode(status))
+
+    def _on_signal(self, signum, frame):
+        if signum != signal.SIGCHLD:
+            self.signals.append(signum)
+
+    def _sleep(self, timeout: float):
+        if select.select([self._wakeup_r], [], [], timeout)[0]:
+            self._drain_wakeup()
+
+    def _drain_wakeup(self):
+        try:
+            while os.read(self._wakeup_r, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def per_process_settings() -> list[str]:
+    """SHARED_STATE_SETTINGS that are set to per-process "memory://" storage."""
+    found = []
+    for name, module in SHARED_STATE_SETTINGS:
+        # A preloaded app has resolved the value already; otherwise the
+        # workers will read it from the environment (and .env)
+        loaded = sys.modules.get(module)
+        uri = getattr(loaded, name) if loaded is not None else os.getenv(name, "")
+        if uri.startswith("memory://"):
+            found.append(name)
+    return found
+
+
+def main(argv: Optional[list[str]] = None, app=None) -> int:
+    """Serve `app`, or APP ("main:app") when it is not given."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--log-level", default=SERVE_LOG_LEVEL)
+    args = parser.parse_args(argv)
+    load_dotenv()
+
+    config = uvicorn.Config(
+        app or APP,
+        loop                        ="auto",
+        http                        ="auto",
+        lifespan                    ="on",
+        backlog                     =SERVE_BACKLOG,
+        access_log                  =SERVE_ACCESS_LOG,
+        log_level                   =args.log_level,
+        timeout_graceful_shutdown   =SERVE_GRACEFUL_TIMEOUT,
+    )
+    # An app object is already imported; an import string is imported here
+    # unless every worker should import it itself
+    if app is not None or SERVE_PRELOAD:
+        config.load()
+        gc.freeze()
+    per_process = per_process_settings()
+    if args.workers > 1 and per_process:
+        logger.error(
+            "%s set to memory://, which each of the %d workers would keep separately; "
+            "use shm:// storage or --workers 1", " and ".join(per_process), args.workers,
+        )
+        return 2
+    return Supervisor(config, args.workers, args.host, args.port).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
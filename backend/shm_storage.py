@@ -0,0 +1,251 @@
+"""
+Rate limit storage shared by every worker process on one host.
+
+Counters live in a fixed-size, memory-mapped file laid out as a
+set-associative table: a key hashes to one group of SLOTS_PER_GROUP slots and
+only that group's byte range is locked (fcntl record lock across processes,
+plus a thread lock inside the process). Memory use is fixed by the slot count;
+expired slots are reused, and when a group is full of live keys the one
+closest to expiry is evicted.
+
+Registered with `limits` under the "shm" scheme, e.g.
+
+    RATE_LIMIT_STORAGE_URI=shm:///dev/shm/nextapi/ratelimit?slots=65536
+
+Without a path the table goes in SHM_DIR, a directory private to the current
+user, under a name unique to this checkout of the app. A table file must be
+a regular file (not a symlink) owned by the current user with no group or
+other permissions, and must already have the size the slot count implies;
+anything else is refused rather than shared or resized under live workers.
+
+Supports the fixed-window strategy (slowapi's default) and, through
+`gcra()`, the per-principal GCRA limiter in rate_limiter.py. With
+`?evict=false` a full group raises StorageFull instead of evicting a live
+key; the revocation list uses this, since an evicted revocation would make
+a revoked token valid again.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+from limits.storage import Storage
+
+SLOT                = struct.Struct("<Qqd")     # key hash, count, expiry (unix time)
+SLOTS_PER_GROUP     = 8
+GROUP               = struct.Struct("<" + "Qqd" * SLOTS_PER_GROUP)
+DEFAULT_SLOTS       = 65536
+SHM_DIR             = os.getenv("SHM_DIR", os.path.join(tempfile.gettempdir(), f"nextapi-{os.geteuid()}"))
+APP_ID              = hashlib.blake2b(os.path.dirname(os.path.abspath(__file__)).encode("utf-8"), digest_size=4).hexdigest()
+
+
+class StorageFull(OSError):
+    """Every slot of the key's group holds a live key and eviction is disabled."""
+
+
+def _check_private(path: str, st: os.stat_result, is_type) -> None:
+    if not is_type(st.st_mode) or st.st_uid != os.geteuid() or st.st_mode & 0o077:
+        raise PermissionError(
+            f"{path}: refusing to use it; it must be owned by uid {os.geteuid()} "
+            "with no group or other permissions"
+        )
+
+
+def default_path(name: str) -> str:
+    """Path of the table `name` in SHM_DIR, creating that directory with mode 0700."""
+    try:
+        os.mkdir(SHM_DIR, 0o700)
+    except FileExistsError:
+        pass
+    _check_private(SHM_DIR, os.lstat(SHM_DIR), stat.S_ISDIR)
+    return os.path.join(SHM_DIR, f"{name}-{APP_ID}.shm")
+
+
+def map_file(path: str, size: int) -> tuple[int, mmap.mmap]:
+    """
+    Open (creating it if missing) the table file at `path` and map it.
+    Refuses a symlink, a file another user owns or can access, and an
+    existing file of a different size.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600)
+    try:
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            st = os.fstat(fd)
+            _check_private(path, st, stat.S_ISREG)
+            if st.st_size == 0:
+                os.ftruncate(fd, size)
+            elif st.st_size != size:
+                raise ValueError(
+                    f"{path}: holds a table of {st.st_size} bytes, not {size}; "
+                    "use the slot count it was created with or remove it while no worker is running"
+                )
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+        return fd, mmap.mmap(fd, size)
+    except BaseException:
+        os.close(fd)
+        raise
+
+
+class SharedMemoryStorage(Storage):
+
+    STORAGE_SCHEME = ["shm"]
+
+    def __init__(self, uri: str | None = None, wrap_exceptions: bool = False, **options):
+        parsed          = urlparse(uri or "")
+        query           = parse_qs(parsed.query)
+        slots           = int(options.get("slots") or query.get("slots", [DEFAULT_SLOTS])[0])
+        evict           = options.get("evict", query.get("evict", ["true"])[0])
+        self.path       = parsed.path or default_path("ratelimit")
+        self.evict      = evict is True or str(evict).lower() == "true"
+        self.num_groups = max(1, slots // SLOTS_PER_GROUP)
+        self.size       = self.num_groups * GROUP.size
+        self.evictions  = 0
+        self._lock      = threading.Lock()
+
+        self._fd, self._map = map_file(self.path, self.size)
+
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self) -> type[Exception] | tuple[type[Exception], ...]:
+        return OSError
+
+    def _locate(self, key: str) -> tuple[int, int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        key_hash = int.from_bytes(digest, "little") | 1
+        return key_hash, (key_hash % self.num_groups) * GROUP.size
+
+    def key_hash(self, key: str) -> int:
+        """The 64-bit hash `key` is stored under."""
+        return self._locate(key)[0]
+
+    def _with_group(self, key: str, fn):
+        key_hash, offset = self._locate(key)
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, GROUP.size, offset, os.SEEK_SET)
+            try:
+                return fn(key_hash, offset, GROUP.unpack_from(self._map, offset), time.time())
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, GROUP.size, offset, os.SEEK_SET)
+
+    @staticmethod
+    def _find(key_hash: int, group: tuple, now: float) -> int:
+        for i in range(0, len(group), 3):
+            if group[i] == key_hash and group[i + 2] > now:
+                return i // 3
+        return -1
+
+    def _victim(self, group: tuple, now: float) -> int:
+        """Reuse an empty/expired slot, otherwise evict the one expiring first."""
+        slot = min(range(SLOTS_PER_GROUP), key=lambda i: group[i * 3 + 2])
+        if group[slot * 3 + 2] > now:
+            if not self.evict:
+                raise StorageFull(f"{self.path}: all {SLOTS_PER_GROUP} slots of the key's group are live")
+            self.evictions += 1
+        return slot
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        def update(key_hash, offset, group, now):
+            slot = self._find(key_hash, group, now)
+            if slot >= 0:
+                count = group[slot * 3 + 1] + amount
+                SLOT.pack_into(self._map, offset + slot * SLOT.size, key_hash, count, group[slot * 3 + 2])
+                return count
+
+            slot = self._victim(group, now)
+            SLOT.pack_into(self._map, offset + slot * SLOT.size, key_hash, amount, now + expiry)
+            return amount
+
+        return self._with_group(key, update)
+
+    def set_max(self, key: str, value: int, expiry: float) -> int:
+        """
+        Raise the key's count to at least `value` and keep it live for at
+        least `expiry` more seconds. Returns the stored count.
+        """
+        def update(key_hash, offset, group, now):
+            slot = self._find(key_hash, group, now)
+            if slot >= 0:
+                value_ = max(group[slot * 3 + 1], value)
+                expires = max(group[slot * 3 + 2], now + expiry)
+            else:
+                slot, value_, expires = self._victim(group, now), value, now + expiry
+            SLOT.pack_into(self._map, offset + slot * SLOT.size, key_hash, value_, expires)
+            return value_
+
+        return self._with_group(key, update)
+
+    def gcra(self, key: str, emission_interval: float, tolerance: float) -> float:
+        """
+        GCRA check-and-update; the slot's expiry field holds the key's
+        theoretical arrival time. Returns 0 if allowed, else seconds to wait.
+        """
+        def update(key_hash, offset, group, now):
+            slot = self._find(key_hash, group, now)
+            tat = group[slot * 3 + 2] if slot >= 0 else now
+            if tat - now > tolerance:
+                return tat - tolerance - now
+            if slot < 0:
+                slot = self._victim(group, now)
+            SLOT.pack_into(self._map, offset + slot * SLOT.size, key_hash, 1, tat + emission_interval)
+            return 0.0
+
+        return self._with_group(key, update)
+
+    def get(self, key: str) -> int:
+        def read(key_hash, offset, group, now):
+            slot = self._find(key_hash, group, now)
+            return group[slot * 3 + 1] if slot >= 0 else 0
+
+        return self._with_group(key, read)
+
+    def get_expiry(self, key: str) -> float:
+        def read(key_hash, offset, group, now):
+            slot = self._find(key_hash, group, now)
+            return group[slot * 3 + 2] if slot >= 0 else now
+
+        return self._with_group(key, read)
+
+    def clear(self, key: str) -> None:
+        def erase(key_hash, offset, group, now):
+            slot = self._find(key_hash, group, now)
+            if slot >= 0:
+                SLOT.pack_into(self._map, offset + slot * SLOT.size, 0, 0, 0.0)
+
+        self._with_group(key, erase)
+
+    def check(self) -> bool:
+        return not self._map.closed
+
+    def live_hashes(self) -> list[int]:
+        """Key hashes of every live slot, read under a lock on the whole table."""
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                return [key_hash for key_hash, _, expiry in SLOT.iter_unpack(self._map) if expiry > now]
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def reset(self) -> int | None:
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                live = sum(
+                    1
+                    for offset in range(0, self.size, SLOT.size)
+                    if SLOT.unpack_from(self._map, offset)[2] > now
+                )
+                self._map[:] = bytes(self.size)
+                return live
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
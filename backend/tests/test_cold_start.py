@@ -0,0 +1,58 @@
+"""
+Cold start: `import main` must not load what only the first request or the
+other database backend needs, nor connect to the database. Checked in a
+fresh interpreter per backend, so it does not depend on what other tests
+imported. Timing budgets are left to `python -m benchmarks.cold_start`,
+which is too noisy for a unit test.
+
+    cd backend && python -m unittest discover -s tests -t .
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from benchmarks.cold_start import BACKEND_DIR
+
+PROBE = """
+import json, sys
+import main
+loaded = sorted(name for name in ("Crypto", "motor", "sqlalchemy") if name in sys.modules)
+engine = sys.modules["database"].async_engine if "database" in sys.modules else None
+print(json.dumps({"loaded": loaded, "engine": engine is not None}))
+"""
+
+
+class ColdStartImportTest(unittest.TestCase):
+
+    def _import_main(self, database_type: str) -> dict:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                "DATABASE_TYPE"             : database_type,
+                "SQLITE_PATH"               : os.path.join(tmp, "app.db"),
+                "RATE_LIMIT_STORAGE_URI"    : f"shm://{os.path.join(tmp, 'ratelimit.shm')}",
+                "REVOCATION_STORAGE_URI"    : f"shm://{os.path.join(tmp, 'revocation.shm')}",
+            }
+            result = subprocess.run(
+                [sys.executable, "-c", PROBE],
+                cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def test_sqlite(self):
+        result = self._import_main("sqlite")
+        self.assertEqual(result["loaded"], ["sqlalchemy"])
+        self.assertFalse(result["engine"], "import main created the database engine")
+
+    def test_mongo(self):
+        result = self._import_main("mongo")
+        self.assertEqual(result["loaded"], ["motor"])
+        self.assertFalse(result["engine"], "import main created the database engine")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Cache of serialized /get_user_details bodies and their ETags.
+
+Entries are keyed by user id and dropped by every user mutation in the
+repository layer (see `evict_user_profile`). Each worker process has its own
+cache, so a change made through another worker is only picked up here once
+the entry's TTL runs out.
+"""
+import hashlib
+import os
+from typing import Optional
+
+from cache import TTLCache
+
+USER_PROFILE_CACHE_SIZE     = int(os.getenv("USER_PROFILE_CACHE_SIZE", "4096"))
+USER_PROFILE_CACHE_TTL      = int(os.getenv("USER_PROFILE_CACHE_TTL", "30"))
+
+# user_id -> (ETag, JSON body)
+profile_cache               = TTLCache(maxsize=USER_PROFILE_CACHE_SIZE, ttl=USER_PROFILE_CACHE_TTL)
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag: a digest of the exact response bytes."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so a W/ prefix is ignored."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def evict_user_profile(user_id: str):
+    profile_cache.pop(user_id)
@@ -22,7 +22,7 @@ export default function RegisterPage() {
     setIsLoading(true);
 
     try {
-      const encryptedData = encryptPayload({ username, email, password });
+      const encryptedData = await encryptPayload({ username, email, password });
 
       const res = await fetch("http://localhost:8000/auth/register", {
         method: "POST",
@@ -1,8 +1,41 @@
 import crypto from "crypto";
 
 const ENCRYPTION_KEY = process.env.NEXT_PUBLIC_ENCRYPTION_KEY || "";
+const ENCRYPTION_VERSION = process.env.NEXT_PUBLIC_ENCRYPTION_VERSION || "1";
+
+// v2 key: HKDF-SHA256(ENCRYPTION_KEY), derived once (matches backend crypto_utils)
+const V2_KEY = Buffer.from(
+  crypto.hkdfSync(
+    "sha256",
+    Buffer.from(ENCRYPTION_KEY),
+    Buffer.alloc(0),
+    Buffer.from("nextapi-payload-v2"),
+    32
+  )
+);
 
 export function encryptPayload(data: object): string {
+  return ENCRYPTION_VERSION === "2"
+    ? encryptPayloadV2(data)
+    : encryptPayloadV1(data);
+}
+
+// Format: "v2." + base64(nonce + ciphertext + tag), AES-256-GCM
+export function encryptPayloadV2(data: object): string {
+  const nonce = crypto.randomBytes(12);
+  const cipher = crypto.createCipheriv("aes-256-gcm", V2_KEY, nonce);
+  const encrypted = Buffer.concat([
+    cipher.update(JSON.stringify(data), "utf8"),
+    cipher.final(),
+  ]);
+
+  return (
+    "v2." +
+    Buffer.concat([nonce, encrypted, cipher.getAuthTag()]).toString("base64")
+  );
+}
+
+export function encryptPayloadV1(data: object): string {
   const jsonString = JSON.stringify(data);
 
   // Generate random salt (8 bytes)
@@ -1,8 +1,77 @@
 import CryptoJS from "crypto-js";
 
 const ENCRYPTION_KEY = process.env.NEXT_PUBLIC_ENCRYPTION_KEY || "";
+const ENCRYPTION_VERSION = process.env.NEXT_PUBLIC_ENCRYPTION_VERSION || "1";
+// With v2, send v1 instead of failing where Web Crypto is unavailable
+// (insecure origins, old browsers). Off unless explicitly enabled.
+const ENCRYPTION_V1_FALLBACK =
+  process.env.NEXT_PUBLIC_ENCRYPTION_V1_FALLBACK === "true";
 
-export function encryptPayload(data: object): string {
+let v2Key: Promise<CryptoKey> | null = null;
+
+export async function encryptPayload(data: object): Promise<string> {
+  if (ENCRYPTION_VERSION !== "2") {
+    return encryptPayloadV1(data);
+  }
+  if (globalThis.crypto?.subtle) {
+    return encryptPayloadV2(data);
+  }
+  if (!ENCRYPTION_V1_FALLBACK) {
+    throw new Error(
+      "Web Crypto is unavailable (is the page served over HTTPS?); cannot encrypt the request"
+    );
+  }
+  console.warn(
+    "Web Crypto is unavailable; sending a v1 (AES-CBC) payload because NEXT_PUBLIC_ENCRYPTION_V1_FALLBACK=true"
+  );
+  return encryptPayloadV1(data);
+}
+
+// v2 key: HKDF-SHA256(ENCRYPTION_KEY), derived once (matches backend crypto_utils)
+function getV2Key(): Promise<CryptoKey> {
+  if (!v2Key) {
+    const encoder = new TextEncoder();
+    v2Key = crypto.subtle
+      .importKey("raw", encoder.encode(ENCRYPTION_KEY), "HKDF", false, [
+        "deriveKey",
+      ])
+      .then((master) =>
+        crypto.subtle.deriveKey(
+          {
+            name: "HKDF",
+            hash: "SHA-256",
+            salt: new Uint8Array(0),
+            info: encoder.encode("nextapi-payload-v2"),
+          },
+          master,
+          { name: "AES-GCM", length: 256 },
+          false,
+          ["encrypt"]
+        )
+      );
+  }
+  return v2Key;
+}
+
+// Format: "v2." + base64(nonce + ciphertext + tag), AES-256-GCM
+export async function encryptPayloadV2(data: object): Promise<string> {
+  const nonce = crypto.getRandomValues(new Uint8Array(12));
+  const encrypted = await crypto.subtle.encrypt(
+    { name: "AES-GCM", iv: nonce },
+    await getV2Key(),
+    new TextEncoder().encode(JSON.stringify(data))
+  );
+
+  const result = new Uint8Array(nonce.length + encrypted.byteLength);
+  result.set(nonce);
+  result.set(new Uint8Array(encrypted), nonce.length);
+
+  let binary = "";
+  result.forEach((byte) => (binary += String.fromCharCode(byte)));
+  return "v2." + btoa(binary);
+}
+
+export function encryptPayloadV1(data: object): string {
   const jsonString = JSON.stringify(data);
   const encrypted = CryptoJS.AES.encrypt(jsonString, ENCRYPTION_KEY).toString();
   return encrypted;